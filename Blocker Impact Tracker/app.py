@@ -3,6 +3,8 @@ B.I.T. - Blocker Impact Tracker
 Sistema para registrar e quantificar o impacto de impedimentos técnicos na produtividade do time de QA.
 """
 
+import functools
+
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
@@ -10,6 +12,9 @@ from datetime import datetime, date
 # Local modules
 from database import (
     init_database, insert_incident, get_all_incidents, delete_incident, update_incident, delete_many_incidents,
+    get_dashboard_rollup, get_dashboard_kpis, get_filter_options, get_heatmap_matrix, get_incident_date_range, get_incidents_page, get_data_version,
+    iter_filtered_incidents, bulk_insert_incidents, get_pool_stats, get_query_stats, get_slow_queries,
+    QUERY_LOG_WINDOW, SLOW_QUERY_MS,
     get_categorias, add_categoria, delete_categoria,
     get_tipos_impacto, add_tipo_impacto, delete_tipo_impacto,
     get_squads, add_squad, delete_squad, update_squad,
@@ -18,8 +23,18 @@ from database import (
 )
 from config import DEFAULT_CAPACITY, MIN_CAPACITY, MAX_CAPACITY
 from styles import get_custom_css
-from charts import create_gauge, create_pareto, create_heatmap, create_timeline, create_squad_breakdown
-from exports import export_to_excel, generate_pdf_report
+from charts import create_gauge, create_pareto, create_heatmap, create_timeline, create_squad_breakdown, timeline_series
+from importer import REQUIRED_COLUMNS, OPTIONAL_COLUMNS, read_upload, validate_incidents
+from exports import iter_csv, export_to_excel, generate_pdf_report, PDF_COLUMNS
+from reports import (
+    CONCLUIDO, ERRO, report_key, submit_report, get_job, load_report, list_jobs,
+    submit_monthly_report, monthly_report_key, start_scheduler
+)
+from metrics import build_metrics, previous_month, score_status
+from profiling import PROFILING_ENABLED, span, fragment_rerun, start_rerun, finish_rerun, summarize_log
+
+# Timing spans of this rerun (debug panel at the end of the sidebar, BIT_PROFILING=1)
+start_rerun()
 
 # ==================== PAGE CONFIG ====================
 st.set_page_config(
@@ -32,9 +47,12 @@ st.set_page_config(
 # Apply custom CSS
 st.markdown(get_custom_css(), unsafe_allow_html=True)
 
-# Initialize database
+# Initialize database (no-op after the first run in this process)
 init_database()
 
+# Background generation of the monthly report (started once per process)
+start_scheduler()
+
 # Session State for Table Key (to force reset selection)
 if 'table_key' not in st.session_state:
     st.session_state.table_key = 0
@@ -109,8 +127,55 @@ def edit_incident_dialog(incident):
         else:
             st.error("Erro ao deletar registro.")
 
+# ==================== FRAGMENTS ====================
+def tab_fragment(name):
+    """Turns a render function into a fragment (st.fragment), timed as `name`.
+    
+    A widget inside a fragment reruns only that fragment. Its arguments are its explicit
+    dependencies on the rest of the page, kept from the last full rerun; actions that
+    change data call st.rerun() so every fragment is refreshed.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with fragment_rerun(name):
+                return fn(*args, **kwargs)
+        return st.fragment(run)
+    return decorator
+
+
+# ==================== EXPORTS ====================
+def render_export(label, formato, filtros, builder, file_name, mime):
+    """Queues an export as a background job and offers the download once it is ready.
+    
+    Reports are stored on disk keyed by (filtros, data version, formato), so every
+    session downloading the same view shares one generated file.
+    """
+    key = report_key(filtros, get_data_version(), formato)
+    
+    if st.button(label, key=f"build_{formato}", use_container_width=True):
+        submit_report(key, formato, builder, label)
+    render_report_status(key, formato, file_name, mime, f"download_{formato}")
+
+
+def render_report_status(key, formato, file_name, mime, download_key):
+    """Shows the job status of a report, or its download button when it is ready."""
+    job = get_job(key)
+    data = load_report(key, formato) if job is None or job['status'] == CONCLUIDO else None
+    if data is not None:
+        st.download_button("📥 Baixar", data, file_name, mime, key=download_key, use_container_width=True)
+    elif job is None or job['status'] == CONCLUIDO:
+        # Nothing queued, or the file was pruned since: the build button submits it again
+        return
+    elif job['status'] == ERRO:
+        st.error(f"Erro ao gerar o relatório: {job['erro']}")
+    else:
+        st.caption("⏳ Gerando em segundo plano...")
+        st.button("🔄 Atualizar", key=f"refresh_{download_key}", use_container_width=True)
+
+
 # ==================== SIDEBAR ====================
-with st.sidebar:
+with st.sidebar, span("sidebar"):
     st.markdown("## ⚙️ Configurações")
     st.markdown("---")
     
@@ -157,7 +222,9 @@ tab_registro, tab_dashboard, tab_historico, tab_config = st.tabs([
 ])
 
 # ==================== TAB 1: REGISTRO ====================
-with tab_registro:
+@tab_fragment("tab.registro")
+def render_registro():
+    """Registration form and bulk import."""
     st.markdown("### 📝 Novo Registro de Impedimento")
     
     # Load dynamic options
@@ -216,14 +283,54 @@ with tab_registro:
                     descricao=descricao,
                     produto=produto
                 )
-                st.success(f"✅ Incidente registrado! HPP: {hpp_calculado:.2f}h")
-                st.balloons()
+                # New data: full rerun so the Dashboard and Histórico fragments refresh too
+                st.session_state.registro_flash = f"✅ Incidente registrado! HPP: {hpp_calculado:.2f}h"
+                st.rerun()
+        elif 'registro_flash' in st.session_state:
+            st.success(st.session_state.pop('registro_flash'))
+            st.balloons()
+    
+    # Bulk import
+    st.markdown("---")
+    with st.expander("📤 Importação em Lote (CSV/Excel)", expanded='import_result' in st.session_state):
+        st.caption(
+            "Colunas: " + ", ".join(REQUIRED_COLUMNS) + " (obrigatórias) e " + ", ".join(OPTIONAL_COLUMNS)
+            + ". Datas em AAAA-MM-DD ou DD/MM/AAAA, hora em HH:MM."
+        )
+        arquivo = st.file_uploader("Arquivo", type=["csv", "xlsx"], label_visibility="collapsed")
+        if arquivo is not None and st.button("📥 Importar Incidentes", use_container_width=True):
+            try:
+                df_upload = read_upload(arquivo, arquivo.name)
+            except Exception as e:
+                st.error(f"❌ Não foi possível ler o arquivo: {e}")
+            else:
+                registros, erros = validate_incidents(df_upload, tipos_impacto, squads, categorias, produtos)
+                inseridos, erros_gravacao = bulk_insert_incidents(registros) if not registros.empty else (0, [])
+                st.session_state.import_result = (inseridos, sorted(erros + erros_gravacao))
+                if inseridos:
+                    st.rerun()
+        
+        if 'import_result' in st.session_state:
+            inseridos, erros = st.session_state.pop('import_result')
+            if inseridos:
+                st.success(f"✅ {inseridos} incidentes importados!")
+            if erros:
+                st.warning(f"⚠️ {len({linha for linha, _ in erros})} linhas com erro não foram importadas.")
+                st.dataframe(pd.DataFrame(erros, columns=['Linha', 'Erro']), use_container_width=True, hide_index=True)
+
+
+with tab_registro:
+    render_registro()
+
 
 # ==================== TAB 2: DASHBOARD ====================
-with tab_dashboard:
-    df = get_all_incidents()
+@tab_fragment("tab.dashboard")
+def render_dashboard(capacidade_total):
+    """Metric cards, charts and PDF reports (depends on the sidebar capacity)."""
+    # Metric cards come from a single aggregate query; charts read the rollup table
+    kpis = get_dashboard_kpis()
     
-    if df.empty:
+    if kpis['total_incidentes'] == 0:
         # Enhanced empty state
         st.markdown("""
         <div style="text-align: center; padding: 60px 20px;">
@@ -233,25 +340,18 @@ with tab_dashboard:
         </div>
         """, unsafe_allow_html=True)
     else:
-        df['data'] = pd.to_datetime(df['data'])
-        
-        # Calculate metrics with trends (compare last 7 days vs previous 7 days)
-        today = df['data'].max()
-        last_7_days = df[df['data'] >= (today - pd.Timedelta(days=7))]
-        prev_7_days = df[(df['data'] >= (today - pd.Timedelta(days=14))) & (df['data'] < (today - pd.Timedelta(days=7)))]
-        
-        total_hpp = df['hpp'].sum()
-        total_incidentes = len(df)
-        media_hpp = df['hpp'].mean()
-        environment_score = max(0, min(10, 10 * (1 - (total_hpp / capacidade_total))))
-        
-        # Calculate trend deltas
-        hpp_trend = last_7_days['hpp'].sum() - prev_7_days['hpp'].sum() if not prev_7_days.empty else 0
-        inc_trend = len(last_7_days) - len(prev_7_days) if not prev_7_days.empty else 0
+        # Trends compare the last 7 days vs the previous 7 days (same metrics as `cli.py metrics`)
+        dashboard_metrics = build_metrics(kpis['total_incidentes'], kpis['total_hpp'], capacidade_total, kpis)
+        total_hpp = dashboard_metrics['total_hpp']
+        total_incidentes = dashboard_metrics['total_incidentes']
+        media_hpp = dashboard_metrics['media_hpp']
+        environment_score = dashboard_metrics['environment_score']
+        hpp_trend = dashboard_metrics['hpp_trend']
+        inc_trend = dashboard_metrics['inc_trend']
         
         col_metrics = st.columns(4)
         with col_metrics[0]:
-            status = 'Bom' if environment_score >= 7 else 'Atenção' if environment_score >= 4 else 'Crítico'
+            status = score_status(environment_score)
             st.metric("🛡️ Saúde do Ambiente", f"{environment_score:.1f}/10", delta=status,
                       delta_color="normal" if environment_score >= 7 else "off" if environment_score >= 4 else "inverse")
         with col_metrics[1]:
@@ -265,12 +365,15 @@ with tab_dashboard:
         
         st.markdown("---")
         
+        # Aggregates come from the rollup table (one row per day/squad/categoria/produto/tipo/hora)
+        df = get_dashboard_rollup()
+        
         # Charts row 1
         col_gauge, col_pareto = st.columns([1, 1])
-        with col_gauge:
+        with col_gauge, span("chart.gauge"):
             st.markdown("#### 🎯 Environment Score")
             st.plotly_chart(create_gauge(environment_score), use_container_width=True)
-        with col_pareto:
+        with col_pareto, span("chart.pareto"):
             st.markdown("#### 📊 Pareto de Bloqueios")
             df_pareto = df.groupby('categoria')['hpp'].sum().reset_index().sort_values('hpp', ascending=True)
             st.plotly_chart(create_pareto(df_pareto), use_container_width=True)
@@ -279,127 +382,204 @@ with tab_dashboard:
         
         # Charts row 2
         col_heatmap, col_timeline = st.columns([1, 1])
-        with col_heatmap:
+        with col_heatmap, span("chart.heatmap"):
             st.markdown("#### 🗓️ Heatmap")
-            df_heat = df.copy()
-            df_heat['dia_semana'] = df_heat['data'].dt.day_name()
-            df_heat['hora'] = df_heat['hora_inicio'].apply(lambda x: int(x.split(':')[0]) if pd.notna(x) and x else 12)
-            dias_ordem = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+            matriz_heatmap = get_heatmap_matrix()
             dias_pt = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
-            df_pivot = df_heat.groupby(['dia_semana', 'hora'])['hpp'].sum().reset_index().pivot_table(
-                values='hpp', index='dia_semana', columns='hora', aggfunc='sum', fill_value=0
-            )
-            df_pivot = df_pivot.reindex(dias_ordem)
-            horas = list(range(8, 20))
-            df_pivot = df_pivot[[h for h in horas if h in df_pivot.columns]]
-            if not df_pivot.empty and len(df_pivot.columns) > 0:
-                st.plotly_chart(create_heatmap(df_pivot, dias_pt), use_container_width=True)
+            horas = range(8, 20)
+            if matriz_heatmap[:, horas].any():
+                st.plotly_chart(create_heatmap(matriz_heatmap, dias_pt, horas), use_container_width=True)
             else:
                 st.info("Dados insuficientes.")
-        with col_timeline:
+        with col_timeline, span("chart.timeline"):
             st.markdown("#### 📈 Timeline")
-            df_timeline = df.groupby(df['data'].dt.date)['hpp'].sum().reset_index()
-            df_timeline.columns = ['data', 'hpp']
-            st.plotly_chart(create_timeline(df_timeline), use_container_width=True)
+            # Day, week or month buckets depending on the range covered
+            df_timeline, bucket = timeline_series(df['data'], df['hpp'])
+            st.plotly_chart(create_timeline(df_timeline, bucket), use_container_width=True)
         
         st.markdown("---")
         st.markdown("#### 👥 Breakdown por Squad")
-        df_squad = df.groupby('squad').agg({'hpp': 'sum', 'id': 'count'}).reset_index()
+        df_squad = df.groupby('squad').agg({'hpp': 'sum', 'incidentes': 'sum'}).reset_index()
         df_squad.columns = ['Squad', 'Total HPP', 'Incidentes']
-        st.plotly_chart(create_squad_breakdown(df_squad), use_container_width=True)
+        with span("chart.squad_breakdown"):
+            st.plotly_chart(create_squad_breakdown(df_squad), use_container_width=True)
         
         # PDF Export section
         st.markdown("---")
         st.markdown("#### 📄 Exportar Relatório")
-        col_pdf_btn, col_pdf_space = st.columns([1, 2])
-        with col_pdf_btn:
-            # Prepare metrics for PDF
-            pdf_metrics = {
-                'total_incidentes': total_incidentes,
-                'total_hpp': total_hpp,
-                'media_hpp': media_hpp,
-                'environment_score': environment_score
-            }
-            pdf_data = generate_pdf_report(df, pdf_metrics, "Mensal")
-            st.download_button(
-                "📥 Baixar Relatório PDF",
-                data=pdf_data,
-                file_name=f"bit_relatorio_{datetime.now().strftime('%Y%m%d')}.pdf",
-                mime="application/pdf",
-                use_container_width=True
+        col_pdf_btn, col_pdf_mensal, col_pdf_space = st.columns([1, 1, 1])
+        with col_pdf_btn, span("export.pdf"):
+            # The PDF uses the same metrics as the cards above
+            pdf_metrics = dashboard_metrics
+            # The report lists individual incidents, so it needs the row-level table (only the columns it reads)
+            render_export(
+                "📄 Gerar Relatório PDF", "pdf", {'capacidade': capacidade_total},
+                lambda: generate_pdf_report(get_all_incidents(PDF_COLUMNS), pdf_metrics, "Mensal"),
+                f"bit_relatorio_{datetime.now().strftime('%Y%m%d')}.pdf", "application/pdf"
             )
+        with col_pdf_mensal, span("export.pdf_mensal"):
+            # Pre-generated by the report scheduler (capacidade padrão)
+            inicio_mes, _ = previous_month()
+            st.caption(f"📅 Relatório mensal {inicio_mes.strftime('%m/%Y')}")
+            chave_mensal = monthly_report_key()
+            if get_job(chave_mensal) is None and load_report(chave_mensal, 'pdf') is None:
+                if st.button("📄 Gerar Relatório Mensal", key="build_monthly", use_container_width=True):
+                    submit_monthly_report()
+            render_report_status(
+                chave_mensal, 'pdf', f"bit_relatorio_mensal_{inicio_mes.strftime('%Y%m')}.pdf",
+                "application/pdf", "download_monthly"
+            )
+
+
+with tab_dashboard:
+    render_dashboard(capacidade_total)
+
 
 # ==================== TAB 3: HISTÓRICO ====================
-with tab_historico:
-    df = get_all_incidents()
+@tab_fragment("historico.tabela")
+def render_historico_tabela(filtros, sort_column, ascending, page_size):
+    """Metrics, pagination, table and selection action bar of the Histórico.
+    
+    Paging and row selection rerun only this fragment; the filters and sorting are
+    its dependencies, passed in by render_historico.
+    """
+    # Apply badge styling to impact type
+    def style_impact(val):
+        if 'Bloqueio' in str(val):
+            return '🔴 ' + val.split('(')[0].strip()
+        elif 'Severa' in str(val):
+            return '🟠 ' + val.split('(')[0].strip()
+        else:
+            return '🟡 ' + val.split('(')[0].strip()
+    
+    # Configure column display
+    column_config = {
+        "ID": st.column_config.NumberColumn("ID", width="small"),
+        "HPP": st.column_config.NumberColumn("HPP", format="%.2f h"),
+        "Duração": st.column_config.NumberColumn("Duração", format="%.2f h"),
+    }
+    
+    df_paginated, resumo, next_cursor = get_incidents_page(
+        filtros,
+        sort_column=sort_column,
+        ascending=ascending,
+        page_size=page_size,
+        cursor=st.session_state.page_cursors[-1]
+    )
+    current_page = len(st.session_state.page_cursors)
+    total_records = resumo['total']
+    total_pages = max(1, (total_records + page_size - 1) // page_size)
+    
+    st.markdown("---")
+    
+    col_m1, col_m2, col_m3 = st.columns(3)
+    with col_m1:
+        st.metric("📊 Incidentes", total_records)
+    with col_m2:
+        st.metric("⏱️ Total HPP", f"{resumo['total_hpp']:.2f}h")
+    with col_m3:
+        st.metric("📈 Média", f"{resumo['total_hpp'] / total_records:.2f}h" if total_records > 0 else "0h")
+    
+    st.markdown("---")
+    
+    # Pagination controls (callbacks move the cursor before the fragment reruns)
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        st.button("◀️ Anterior", use_container_width=True, disabled=current_page <= 1,
+                  on_click=st.session_state.page_cursors.pop)
+    with col_info:
+        st.markdown(f"<div style='text-align: center; padding: 8px;'>Página **{current_page}** de **{total_pages}** ({total_records} registros)</div>", unsafe_allow_html=True)
+    with col_next:
+        st.button("Próxima ▶️", use_container_width=True, disabled=next_cursor is None or current_page >= total_pages,
+                  on_click=st.session_state.page_cursors.append, args=(next_cursor,))
+    
+    # Prepare display dataframe
+    df_display = df_paginated.copy()
+    df_display['data'] = pd.to_datetime(df_display['data']).dt.strftime('%d/%m/%Y')
+    df_display['tipo_impacto'] = df_display['tipo_impacto'].apply(style_impact)
+    df_display = df_display[['id', 'data', 'hora_inicio', 'squad', 'produto', 'categoria', 'tipo_impacto', 'duracao', 'hpp', 'descricao']]
+    df_display.columns = ['ID', 'Data', 'Hora', 'Squad', 'Produto', 'Categoria', 'Impacto', 'Duração', 'HPP', 'Descrição']
     
-    if df.empty:
+    event = st.dataframe(
+        df_display,
+        use_container_width=True,
+        hide_index=True,
+        column_config=column_config,
+        on_select="rerun",
+        selection_mode="multi-row",
+        key=f"history_table_{st.session_state.table_key}"
+    )
+    
+    # Action Bar for selection
+    if len(event.selection.rows) > 0:
+        st.markdown("---")
+        selected_indices = event.selection.rows
+        # Get IDs from displayed dataframe
+        selected_ids = [int(df_display.iloc[idx]['ID']) for idx in selected_indices]
+        count = len(selected_ids)
+    
+        c1, c2, c3 = st.columns([1, 1, 3])
+    
+        with c1:
+            # Edit button only for single selection
+            if count == 1:
+                if st.button("✏️ Editar", use_container_width=True, type="primary"):
+                    record = df_paginated[df_paginated['id'] == selected_ids[0]].iloc[0]
+                    edit_incident_dialog(record)
+            else:
+                st.button("✏️ Editar", disabled=True, use_container_width=True, help="Selecione apenas 1 registro para editar")
+    
+        with c2:
+            # Delete button handles multiple
+            if st.button(f"🗑️ Excluir ({count})", type="secondary", use_container_width=True):
+                if delete_many_incidents(selected_ids):
+                    st.success(f"✅ {count} registros excluídos!")
+                    st.session_state.table_key += 1
+                    st.rerun()
+                else:
+                    st.error("Erro ao excluir registros.")
+
+
+@tab_fragment("tab.historico")
+def render_historico():
+    """Filters, paginated table and exports."""
+    data_min, data_max = get_incident_date_range()
+    
+    if data_min is None:
         st.info("📭 Nenhum incidente registrado ainda.")
     else:
-        df['data'] = pd.to_datetime(df['data'])
+        data_min, data_max = pd.to_datetime(data_min).date(), pd.to_datetime(data_max).date()
+        # Reference names plus names only found on incidents (legacy or deleted values)
+        opcoes = get_filter_options()
+        squads_opcoes = opcoes['squads']
+        categorias_opcoes = opcoes['categorias']
+        tipos_opcoes = opcoes['tipos']
         
         # Filters
         col_filtros = st.columns(4)
         with col_filtros[0]:
-            data_min, data_max = df['data'].min().date(), df['data'].max().date()
             data_range = st.date_input("📅 Período", value=(data_min, data_max), min_value=data_min, max_value=data_max)
         with col_filtros[1]:
-            squad_filtro = st.selectbox("👥 Squad", ['Todos'] + df['squad'].unique().tolist(), key="hist_squad")
+            squad_filtro = st.selectbox("👥 Squad", ['Todos'] + squads_opcoes, key="hist_squad")
         with col_filtros[2]:
-            categoria_filtro = st.selectbox("📂 Categoria", ['Todas'] + df['categoria'].unique().tolist(), key="hist_cat")
+            categoria_filtro = st.selectbox("📂 Categoria", ['Todas'] + categorias_opcoes, key="hist_cat")
         with col_filtros[3]:
-            tipo_filtro = st.selectbox("⚠️ Impacto", ['Todos'] + df['tipo_impacto'].unique().tolist(), key="hist_tipo")
+            tipo_filtro = st.selectbox("⚠️ Impacto", ['Todos'] + tipos_opcoes, key="hist_tipo")
         
         col_f1, col_f2, col_f3, col_f4 = st.columns(4)
         with col_f1:
-            f_squad = st.multiselect("Squad", options=sorted(df['squad'].unique()))
+            f_squad = st.multiselect("Squad", options=sorted(squads_opcoes))
         with col_f2:
-            f_prod = st.multiselect("Produto", options=sorted(df['produto'].dropna().unique()) if 'produto' in df.columns else [])
+            f_prod = st.multiselect("Produto", options=opcoes['produtos'])
         with col_f3:
-            f_cat = st.multiselect("Categoria", options=sorted(df['categoria'].unique()))
+            f_cat = st.multiselect("Categoria", options=sorted(categorias_opcoes))
         with col_f4:
-            f_tipo = st.multiselect("Impacto", options=sorted(df['tipo_impacto'].unique()))
+            f_tipo = st.multiselect("Impacto", options=sorted(tipos_opcoes))
         
-        # Apply filters
-        df_filtrado = df.copy()
+        # Filter set applied in SQL
+        filtros = {'squads': f_squad, 'produtos': f_prod, 'categorias': f_cat, 'tipos': f_tipo}
         if len(data_range) == 2:
-            df_filtrado = df_filtrado[(df_filtrado['data'].dt.date >= data_range[0]) & (df_filtrado['data'].dt.date <= data_range[1])]
-        if f_squad:
-            df_filtrado = df_filtrado[df_filtrado['squad'].isin(f_squad)]
-        if f_prod and 'produto' in df.columns:
-            df_filtrado = df_filtrado[df_filtrado['produto'].isin(f_prod)]
-        if f_cat:
-            df_filtrado = df_filtrado[df_filtrado['categoria'].isin(f_cat)]
-        if f_tipo:
-            df_filtrado = df_filtrado[df_filtrado['tipo_impacto'].isin(f_tipo)]
-        
-        st.markdown("---")
-        
-        col_m1, col_m2, col_m3 = st.columns(3)
-        with col_m1:
-            st.metric("📊 Incidentes", len(df_filtrado))
-        with col_m2:
-            st.metric("⏱️ Total HPP", f"{df_filtrado['hpp'].sum():.2f}h")
-        with col_m3:
-            st.metric("📈 Média", f"{df_filtrado['hpp'].mean():.2f}h" if len(df_filtrado) > 0 else "0h")
-        
-        st.markdown("---")
-        
-        # Apply badge styling to impact type
-        def style_impact(val):
-            if 'Bloqueio' in str(val):
-                return '🔴 ' + val.split('(')[0].strip()
-            elif 'Severa' in str(val):
-                return '🟠 ' + val.split('(')[0].strip()
-            else:
-                return '🟡 ' + val.split('(')[0].strip()
-        
-        # Configure column display
-        column_config = {
-            "ID": st.column_config.NumberColumn("ID", width="small"),
-            "HPP": st.column_config.NumberColumn("HPP", format="%.2f h"),
-            "Duração": st.column_config.NumberColumn("Duração", format="%.2f h"),
-        }
+            filtros['data_inicio'], filtros['data_fim'] = data_range
         
         # Sorting options
         col_sort, col_order, col_page_size = st.columns([2, 1, 1])
@@ -414,98 +594,42 @@ with tab_historico:
         with col_page_size:
             page_size = st.selectbox("Por página", [10, 25, 50, 100], key="page_size")
         
-        # Apply sorting
         sort_map = {'Data': 'data', 'HPP': 'hpp', 'Duração': 'duracao', 'Squad': 'squad', 'Categoria': 'categoria'}
         ascending = "Asc" in sort_order
         
-        # Sort on original df_filtrado before display transformation
-        df_sorted = df_filtrado.sort_values(by=sort_map.get(sort_column, 'data'), ascending=ascending)
-        
-        # Pagination
-        total_records = len(df_sorted)
-        total_pages = max(1, (total_records + page_size - 1) // page_size)
-        
-        if 'current_page' not in st.session_state:
-            st.session_state.current_page = 1
-        
-        # Pagination controls
-        col_prev, col_info, col_next = st.columns([1, 2, 1])
-        with col_prev:
-            if st.button("◀️ Anterior", use_container_width=True, disabled=st.session_state.current_page <= 1):
-                st.session_state.current_page -= 1
-                st.rerun()
-        with col_info:
-            st.markdown(f"<div style='text-align: center; padding: 8px;'>Página **{st.session_state.current_page}** de **{total_pages}** ({total_records} registros)</div>", unsafe_allow_html=True)
-        with col_next:
-            if st.button("Próxima ▶️", use_container_width=True, disabled=st.session_state.current_page >= total_pages):
-                st.session_state.current_page += 1
-                st.rerun()
-        
-        # Apply pagination
-        start_idx = (st.session_state.current_page - 1) * page_size
-        end_idx = start_idx + page_size
-        df_paginated = df_sorted.iloc[start_idx:end_idx]
-        
-        # Prepare display dataframe
-        df_display = df_paginated.copy()
-        df_display['data'] = pd.to_datetime(df_display['data']).dt.strftime('%d/%m/%Y')
-        df_display['tipo_impacto'] = df_display['tipo_impacto'].apply(style_impact)
-        df_display = df_display[['id', 'data', 'hora_inicio', 'squad', 'produto', 'categoria', 'tipo_impacto', 'duracao', 'hpp', 'descricao']]
-        df_display.columns = ['ID', 'Data', 'Hora', 'Squad', 'Produto', 'Categoria', 'Impacto', 'Duração', 'HPP', 'Descrição']
-        
-        event = st.dataframe(
-            df_display,
-            use_container_width=True,
-            hide_index=True,
-            column_config=column_config,
-            on_select="rerun",
-            selection_mode="multi-row",
-            key=f"history_table_{st.session_state.table_key}"
-        )
+        # Keyset pagination: keep the cursor that starts each visited page.
+        # Any change to filters, sorting or page size restarts from page 1.
+        query_key = (repr(sorted(filtros.items())), sort_column, sort_order, page_size)
+        if st.session_state.get('hist_query_key') != query_key:
+            st.session_state.hist_query_key = query_key
+            st.session_state.page_cursors = [None]
         
-        # Action Bar for selection
-        if len(event.selection.rows) > 0:
-            st.markdown("---")
-            selected_indices = event.selection.rows
-            # Get IDs from displayed dataframe
-            selected_ids = [int(df_display.iloc[idx]['ID']) for idx in selected_indices]
-            count = len(selected_ids)
-            
-            c1, c2, c3 = st.columns([1, 1, 3])
-            
-            with c1:
-                # Edit button only for single selection
-                if count == 1:
-                    if st.button("✏️ Editar", use_container_width=True, type="primary"):
-                        record = df[df['id'] == selected_ids[0]].iloc[0]
-                        edit_incident_dialog(record)
-                else:
-                    st.button("✏️ Editar", disabled=True, use_container_width=True, help="Selecione apenas 1 registro para editar")
-
-            with c2:
-                # Delete button handles multiple
-                if st.button(f"🗑️ Excluir ({count})", type="secondary", use_container_width=True):
-                    if delete_many_incidents(selected_ids):
-                        st.success(f"✅ {count} registros excluídos!")
-                        st.session_state.table_key += 1
-                        st.rerun()
-                    else:
-                        st.error("Erro ao excluir registros.")
+        render_historico_tabela(filtros, sort_map.get(sort_column, 'data'), ascending, page_size)
         
         st.markdown("---")
         col_csv, col_excel = st.columns(2)
-        with col_csv:
-            csv = df_filtrado.to_csv(index=False, encoding='utf-8-sig')
-            st.download_button("📥 Exportar CSV", csv, f"bit_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv", use_container_width=True)
-        with col_excel:
-            xlsx_data = export_to_excel(df_filtrado)
-            st.download_button("📊 Exportar Excel", xlsx_data, f"bit_{datetime.now().strftime('%Y%m%d')}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", use_container_width=True)
+        with col_csv, span("export.csv"):
+            render_export(
+                "📥 Exportar CSV", "csv", filtros,
+                lambda: iter_csv(iter_filtered_incidents(filtros)),  # streamed to the report file
+                f"bit_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv"
+            )
+        with col_excel, span("export.xlsx"):
+            render_export(
+                "📊 Exportar Excel", "xlsx", filtros,
+                lambda: export_to_excel(iter_filtered_incidents(filtros)),
+                f"bit_{datetime.now().strftime('%Y%m%d')}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
 
-            
+
+with tab_historico:
+    render_historico()
 
 
 # ==================== TAB 4: CONFIGURAÇÕES ====================
-with tab_config:
+@tab_fragment("tab.config")
+def render_configuracoes():
+    """Reference data management and diagnostics."""
     st.markdown("### ⚙️ Gerenciar Opções")
     st.caption("Adicione, edite ou remova categorias, tipos de impacto e squads")
     
@@ -662,6 +786,62 @@ with tab_config:
                     else:
                         st.error("❌ Já existe!")
 
+    # ========== DIAGNÓSTICO ==========
+    st.markdown("---")
+    with st.expander("🔌 Pool de Conexões", expanded=False):
+        pool_stats = get_pool_stats()
+        col_p1, col_p2, col_p3, col_p4 = st.columns(4)
+        with col_p1:
+            st.metric("Em uso", pool_stats.get('checkedout', '-'))
+        with col_p2:
+            st.metric("Overflow", pool_stats.get('overflow', '-'))
+        with col_p3:
+            st.metric("Espera p95", f"{pool_stats['wait_ms_p95']:.1f} ms" if 'wait_ms_p95' in pool_stats else "-")
+        with col_p4:
+            st.metric("Timeouts", pool_stats['timeouts'])
+        st.json(pool_stats)
+    
+    with st.expander("🐢 Consultas Lentas", expanded=False):
+        st.caption(f"Top 10 por tempo total nas últimas {QUERY_LOG_WINDOW} consultas • lenta acima de {SLOW_QUERY_MS:.0f} ms")
+        query_stats = get_query_stats(10)
+        if query_stats:
+            df_queries = pd.DataFrame(query_stats)[['statement', 'call_site', 'calls', 'total_ms', 'avg_ms', 'max_ms', 'rows']]
+            df_queries.columns = ['Consulta', 'Origem', 'Execuções', 'Total (ms)', 'Média (ms)', 'Máx (ms)', 'Linhas']
+            st.dataframe(df_queries, use_container_width=True, hide_index=True)
+        for slow in get_slow_queries()[:5]:
+            st.markdown(f"**{slow['ms']:.0f} ms** • `{slow['call_site']}` • {slow['ts'].strftime('%d/%m %H:%M:%S')}")
+            st.code(slow['statement'] + ("\n\n" + "\n".join(slow['plan']) if slow['plan'] else ""), language="sql")
+    
+    with st.expander("📑 Relatórios em Segundo Plano", expanded=False):
+        jobs = list_jobs()
+        if jobs:
+            df_jobs = pd.DataFrame(jobs)[['descricao', 'formato', 'status', 'criado_em', 'concluido_em', 'erro']]
+            df_jobs.columns = ['Relatório', 'Formato', 'Status', 'Criado em', 'Concluído em', 'Erro']
+            st.dataframe(df_jobs, use_container_width=True, hide_index=True)
+        else:
+            st.caption("Nenhum relatório gerado desde a inicialização.")
+        st.button("🔄 Atualizar", key="refresh_jobs")
+
+
+with tab_config:
+    render_configuracoes()
+
+
 # ==================== FOOTER ====================
 st.markdown("---")
 st.caption("🛡️ B.I.T. - Blocker Impact Tracker v1.0 • Desenvolvido para times de QA")
+
+# ==================== PROFILING PANEL ====================
+if PROFILING_ENABLED:
+    spans_rerun = finish_rerun()
+    with st.sidebar:
+        st.markdown("---")
+        with st.expander("🐞 Profiling", expanded=False):
+            if spans_rerun:
+                st.caption(f"Este rerun: {spans_rerun[-1]['ms']:.0f} ms")
+                df_spans = pd.DataFrame(spans_rerun)[['name', 'parent', 'ms']]
+                st.dataframe(df_spans.sort_values('ms', ascending=False), use_container_width=True, hide_index=True)
+            st.caption("Todas as sessões (p50/p95)")
+            resumo = summarize_log()
+            if resumo:
+                st.dataframe(pd.DataFrame(resumo), use_container_width=True, hide_index=True)
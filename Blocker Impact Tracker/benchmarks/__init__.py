@@ -0,0 +1,4 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Benchmarks package - Performance measurements for data loading and exports
+"""
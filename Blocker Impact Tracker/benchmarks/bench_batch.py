@@ -0,0 +1,62 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Batch report benchmark - sequential vs process pool generate_batch_reports
+
+Usage:
+    python -m benchmarks.bench_batch --rows 100000 1000000 --por squad produto
+"""
+
+import argparse
+import json
+import os
+import time
+
+from benchmarks.bench_excel import synthetic_incidents
+from exports import generate_batch_reports
+
+
+def _timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return min(runs)
+
+
+def run(rows_list, groups, processes=None, repeat=3):
+    """Times generate_batch_reports with one process and with the pool; returns the result rows."""
+    results = []
+    for rows in rows_list:
+        df = synthetic_incidents(rows)
+        for by in groups:
+            sequential = _timed(lambda: generate_batch_reports(df, by, processes=1), repeat)
+            parallel = _timed(lambda: generate_batch_reports(df, by, processes=processes), repeat)
+            result = {
+                'rows': rows,
+                'por': by,
+                'groups': int(df[by].nunique(dropna=False)),
+                'workers': processes or os.cpu_count(),
+                'sequential_s': round(sequential, 4),
+                'parallel_s': round(parallel, 4),
+                'speedup': round(sequential / parallel, 2),
+            }
+            results.append(result)
+            print(f"{rows:>9} rows  {by:<8} {result['groups']:>3} groups  "
+                  f"seq {sequential:7.3f}s  pool {parallel:7.3f}s  {result['speedup']:5.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sequential vs parallel batch report benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--por", nargs="+", choices=('squad', 'produto'), default=['squad', 'produto'])
+    parser.add_argument("--processes", type=int, help="pool size (default: all cores)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.por, args.processes, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
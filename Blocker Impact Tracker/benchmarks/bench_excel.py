@@ -0,0 +1,97 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Excel export benchmark - time and peak memory (RSS) of export_to_excel
+
+Usage:
+    python -m benchmarks.bench_excel --rows 100000 1000000
+"""
+
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_incidents
+from exports import export_to_excel
+
+
+def synthetic_incidents(rows, seed=42):
+    """Builds an incidents-shaped DataFrame with `rows` rows from the synthetic generator."""
+    df = generate_incidents(rows, seed=seed)
+    df.insert(0, 'id', np.arange(1, rows + 1))
+    df['data'] = pd.to_datetime(df['data'])
+    return df
+
+
+def legacy_export_to_excel(df):
+    """Previous implementation: openpyxl in normal mode through pd.ExcelWriter."""
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df_export = df.copy()
+        df_export.to_excel(writer, sheet_name='Incidentes', index=False)
+        worksheet = writer.sheets['Incidentes']
+        for idx, col in enumerate(df_export.columns):
+            max_length = max(df_export[col].astype(str).map(len).max(), len(str(col))) + 2
+            worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
+    return output.getvalue()
+
+
+def _max_rss_mb():
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(case, rows, chunk_size=50_000):
+    """Runs one case in the current process and returns its time and peak RSS growth."""
+    df = synthetic_incidents(rows)
+    calls = {
+        'write_only_frame': lambda: export_to_excel(df),
+        'write_only_chunks': lambda: export_to_excel(df.iloc[i:i + chunk_size] for i in range(0, len(df), chunk_size)),
+        'legacy': lambda: legacy_export_to_excel(df),
+    }
+    rss_before = _max_rss_mb()
+    start = time.perf_counter()
+    size = len(calls[case]())
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'case': case,
+        'seconds': round(elapsed, 2),
+        'peak_rss_growth_mb': round(_max_rss_mb() - rss_before, 1),
+        'file_mb': round(size / 1024 / 1024, 1),
+    }
+
+
+def run(row_counts, include_legacy=True):
+    """Runs every case in a fresh interpreter so peak RSS is not shared between cases."""
+    cases = ['write_only_frame', 'write_only_chunks'] + (['legacy'] if include_legacy else [])
+    results = []
+    for rows in row_counts:
+        for case in cases:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_excel', '--case', case, '--rows', str(rows)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{rows:>9} rows  {case:<18} {result['seconds']:8.2f}s  {result['peak_rss_growth_mb']:9.1f} MB peak RSS growth")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark export_to_excel")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--no-legacy", action="store_true", help="skip the previous implementation")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.rows[0])))
+    else:
+        run(args.rows, include_legacy=not args.no_legacy)
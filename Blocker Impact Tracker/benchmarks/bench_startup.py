@@ -0,0 +1,161 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Startup benchmark - import-time breakdown and time to first render of app.py
+
+Every measurement runs in a fresh interpreter, as after a scale-to-zero cold start.
+
+Usage:
+    python -m benchmarks.bench_startup --output bench_startup.json
+    python -m benchmarks.bench_startup --rows 100000 --repeat 5
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(APP_DIR, "app.py")
+
+# Packages whose import cost is reported on its own (cumulative time of their first import)
+HEAVY_PACKAGES = [
+    'streamlit', 'pandas', 'numpy', 'sqlalchemy', 'plotly.express', 'plotly.graph_objects', 'reportlab.platypus', 'openpyxl',
+]
+
+RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+ready = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+done = time.perf_counter()
+print(json.dumps({{
+    'streamlit_s': ready - start,
+    'run_s': done - ready,
+    'exceptions': [str(e.value) for e in at.exception],
+    'loaded': sorted(name for name in {heavy!r} if name in sys.modules),
+}}))
+"""
+
+
+def app_imports():
+    """Returns the top-level modules imported by app.py (in order)."""
+    with open(APP_FILE, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        else:
+            continue
+        modules.extend(name for name in names if name not in modules)
+    return modules
+
+
+def import_breakdown(modules, env):
+    """Imports `modules` under -X importtime; returns (top-level ms per module, heavy package ms)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {name}" for name in modules)],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    top_level, heavy = {}, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        ms = int(cumulative) / 1000
+        if not name.startswith("  "):
+            top_level[name.strip()] = ms
+        if name.strip() in HEAVY_PACKAGES:
+            heavy.setdefault(name.strip(), ms)
+    return top_level, heavy
+
+
+def first_render(env):
+    """Runs app.py once through AppTest in a fresh interpreter; returns its timings."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", RENDER_SCRIPT.format(app=APP_FILE, heavy=HEAVY_PACKAGES)],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['process_s'] = time.perf_counter() - start
+    return timings
+
+
+def run(env, repeat=3):
+    """Returns the results document: median import breakdown and first-render timings."""
+    modules = app_imports()
+    breakdowns = [import_breakdown(modules, env) for _ in range(repeat)]
+    renders = [first_render(env) for _ in range(repeat)]
+
+    def median(values):
+        return round(statistics.median(values), 4)
+
+    top_level = {
+        name: median([top[name] for top, _ in breakdowns if name in top])
+        for name in breakdowns[0][0] if name in modules
+    }
+    heavy = {
+        name: median([packages[name] for _, packages in breakdowns if name in packages])
+        for name in HEAVY_PACKAGES if name in breakdowns[0][1]
+    }
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'repeat': repeat,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+        },
+        'imports_ms': dict(sorted(top_level.items(), key=lambda item: item[1], reverse=True)),
+        'packages_ms': heavy,
+        'first_render': {
+            'process_s': median([render['process_s'] for render in renders]),
+            'streamlit_s': median([render['streamlit_s'] for render in renders]),
+            'run_s': median([render['run_s'] for render in renders]),
+            'loaded': renders[-1]['loaded'],
+            'exceptions': renders[-1]['exceptions'],
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the Streamlit app")
+    parser.add_argument("--database-url", help="database for the render (default: a temporary SQLite file)")
+    parser.add_argument("--rows", type=int, default=0, help="synthetic incidents to fill the temporary database")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    else:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="bit_startup_"), "startup.db")
+        env["DATABASE_URL"] = f"sqlite:///{db_path}"
+        if args.rows:
+            os.environ["DATABASE_URL"] = env["DATABASE_URL"]
+            from benchmarks.synthetic import fill_database
+            fill_database(args.rows)
+
+    document = run(env, args.repeat)
+    for name, ms in document['imports_ms'].items():
+        print(f"import {name:<22} {ms:9.1f} ms")
+    for name, ms in document['packages_ms'].items():
+        print(f"  package {name:<19} {ms:9.1f} ms")
+    render = document['first_render']
+    print(f"first render: {render['process_s']:.2f}s process "
+          f"(streamlit {render['streamlit_s']:.2f}s, app run {render['run_s']:.2f}s)")
+    print(f"loaded after first render: {', '.join(render['loaded'])}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
@@ -3,8 +3,17 @@ B.I.T. - Blocker Impact Tracker
 Charts module - Plotly visualizations with consistent light theme
 """
 
-import plotly.express as px
-import plotly.graph_objects as go
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# plotly is imported inside the chart builders: it is only needed once a chart is
+# rendered, so the app's cold start (and the CLI) does not pay for it
 
 # Chart theme colors (light mode)
 CHART_COLORS = {
@@ -20,6 +29,68 @@ CHART_COLORS = {
 }
 
 
+# ==================== FIGURE CACHE ====================
+# Serialised figures keyed by a hash of the builder's inputs, least recently used evicted first
+FIGURE_CACHE_SIZE = int(os.getenv("FIGURE_CACHE_SIZE", "64"))
+
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+
+def _hash_input(value, digest):
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr((list(value.columns), [str(dtype) for dtype in value.dtypes], value.shape)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.shape, str(value.dtype))).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        digest.update(repr(value).encode())
+
+
+def figure_key(name, *args, **kwargs):
+    """Hash of a figure builder's name and its (aggregated) inputs."""
+    digest = hashlib.sha256(name.encode())
+    for value in list(args) + sorted(kwargs.items()):
+        _hash_input(value, digest)
+    return digest.hexdigest()
+
+
+def clear_figure_cache():
+    """Drops every cached figure."""
+    with _figure_cache_lock:
+        _figure_cache.clear()
+
+
+def memoized_figure(builder):
+    """Caches the figures returned by `builder` as JSON; every call gets a new Figure.
+    
+    The cached JSON was produced by a validated Figure, so it is rebuilt without
+    validating it again (a few ms instead of a full build); callers may mutate it.
+    """
+    @functools.wraps(builder)
+    def wrapper(*args, **kwargs):
+        import plotly.graph_objects as go
+        
+        key = figure_key(builder.__name__, *args, **kwargs)
+        with _figure_cache_lock:
+            cached = _figure_cache.get(key)
+            if cached is not None:
+                _figure_cache.move_to_end(key)
+        if cached is not None:
+            return go.Figure(json.loads(cached), _validate=False)
+        
+        fig = builder(*args, **kwargs)
+        with _figure_cache_lock:
+            _figure_cache[key] = fig.to_json()
+            _figure_cache.move_to_end(key)
+            while len(_figure_cache) > FIGURE_CACHE_SIZE:
+                _figure_cache.popitem(last=False)
+        return fig
+    return wrapper
+
+
+# ==================== CHARTS ====================
 def get_chart_layout(height=300):
     """Returns base layout for all charts."""
     return dict(
@@ -33,8 +104,11 @@ def get_chart_layout(height=300):
     )
 
 
+@memoized_figure
 def create_gauge(score, title="Environment Score"):
     """Creates an environment score gauge chart."""
+    import plotly.graph_objects as go
+    
     if score >= 7:
         color = CHART_COLORS['green']
         status = "Saudável"
@@ -68,8 +142,11 @@ def create_gauge(score, title="Environment Score"):
     return fig
 
 
+@memoized_figure
 def create_pareto(df_pareto):
     """Creates a horizontal bar chart for Pareto analysis."""
+    import plotly.express as px
+    
     fig = px.bar(
         df_pareto, 
         x='hpp', 
@@ -86,12 +163,20 @@ def create_pareto(df_pareto):
     return fig
 
 
-def create_heatmap(df_pivot, dias_pt):
-    """Creates a heatmap for instability visualization."""
+@memoized_figure
+def create_heatmap(matrix, dias_pt, horas=range(24)):
+    """Creates a heatmap for instability visualization.
+    
+    `matrix` is the dense weekday x hour array from database.get_heatmap_matrix;
+    only the `horas` columns are shown.
+    """
+    import plotly.express as px
+    
+    horas = list(horas)
     fig = px.imshow(
-        df_pivot.values, 
-        x=[f"{h}h" for h in df_pivot.columns],
-        y=dias_pt[:len(df_pivot.index)],
+        matrix[:, horas], 
+        x=[f"{h}h" for h in horas],
+        y=dias_pt,
         color_continuous_scale=['#f8fafc', CHART_COLORS['green'], CHART_COLORS['yellow'], CHART_COLORS['red']],
         aspect='auto'
     )
@@ -100,24 +185,110 @@ def create_heatmap(df_pivot, dias_pt):
     return fig
 
 
-def create_timeline(df_timeline):
-    """Creates a line chart for timeline visualization."""
-    fig = px.line(df_timeline, x='data', y='hpp', markers=True)
+# ==================== TIMELINE ====================
+# Target number of points on the timeline and the size above which it switches to WebGL
+TIMELINE_MAX_POINTS = 400
+TIMELINE_WEBGL_THRESHOLD = 300
+
+# 'S' marks LTTB-sampled days: single days picked from the series, not aggregates
+TIMELINE_BUCKETS = {'D': 'Dia', 'W': 'Semana', 'M': 'Mês', 'S': 'Dia (amostra)'}
+
+
+def timeline_bucket(inicio, fim, max_points=TIMELINE_MAX_POINTS):
+    """Picks the day, week or month bucket that keeps the range within max_points.
     
-    fig.update_traces(
-        line_color=CHART_COLORS['blue'], 
-        marker_color=CHART_COLORS['blue'], 
-        marker_size=8,
-        fill='tozeroy', 
-        fillcolor=CHART_COLORS['blue_light']
-    )
+    Returns None when even monthly buckets would not fit: the daily series is then
+    downsampled with LTTB instead.
+    """
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    dias = (fim - inicio).days + 1
+    if dias <= max_points:
+        return 'D'
+    if dias / 7 <= max_points:
+        return 'W'
+    if (fim.year - inicio.year) * 12 + fim.month - inicio.month + 1 <= max_points:
+        return 'M'
+    return None
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices of the kept points.
+    
+    Keeps the first and last points and, for each bucket in between, the point forming
+    the largest triangle with the previously kept point and the next bucket's average.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        prox_start, prox_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        media_x = x[prox_start:max(prox_end, prox_start + 1)].mean()
+        media_y = y[prox_start:max(prox_end, prox_start + 1)].mean()
+        area = np.abs(
+            (x[anterior] - media_x) * (y[start:end] - y[anterior])
+            - (x[anterior] - x[start:end]) * (media_y - y[anterior])
+        )
+        anterior = start + int(area.argmax())
+        indices[i + 1] = anterior
+    return indices
+
+
+def timeline_series(datas, valores, max_points=TIMELINE_MAX_POINTS):
+    """Aggregates HPP per day, week or month; LTTB-samples the daily series beyond that.
+    
+    Returns (DataFrame with 'data' and 'hpp', bucket code from TIMELINE_BUCKETS). With
+    bucket 'S' the points are single sampled days (LTTB keeps their peaks), not sums.
+    """
+    datas = pd.to_datetime(pd.Series(datas)).reset_index(drop=True)
+    valores = pd.Series(valores).reset_index(drop=True)
+    if datas.empty:
+        return pd.DataFrame({'data': [], 'hpp': []}), 'D'
+    
+    diaria = valores.groupby(datas.dt.normalize()).sum().sort_index()
+    bucket = timeline_bucket(diaria.index[0], diaria.index[-1], max_points)
+    if bucket in ('W', 'M'):
+        diaria = diaria.groupby(diaria.index.to_period(bucket).start_time).sum()
+    elif bucket is None:
+        keep = lttb(diaria.index.to_numpy().astype('int64'), diaria.to_numpy(), max_points)
+        diaria, bucket = diaria.iloc[keep], 'S'
+    return pd.DataFrame({'data': diaria.index, 'hpp': diaria.to_numpy()}), bucket
+
+
+@memoized_figure
+def create_timeline(df_timeline, bucket='D'):
+    """Creates a line chart for timeline visualization (WebGL above the size threshold)."""
+    import plotly.graph_objects as go
+    
+    large = len(df_timeline) > TIMELINE_WEBGL_THRESHOLD
+    trace = go.Scattergl if large else go.Scatter
+    fig = go.Figure(trace(
+        x=df_timeline['data'],
+        y=df_timeline['hpp'],
+        mode='lines' if large else 'lines+markers',
+        line={'color': CHART_COLORS['blue']},
+        marker={'color': CHART_COLORS['blue'], 'size': 8},
+        fill='tozeroy',
+        fillcolor=CHART_COLORS['blue_light'],
+        hovertemplate=f"{TIMELINE_BUCKETS[bucket]}: %{{x|{'%m/%Y' if bucket == 'M' else '%d/%m/%Y'}}}<br>HPP: %{{y:.2f}}h<extra></extra>"
+    ))
     
     fig.update_layout(**get_chart_layout())
     return fig
 
 
+@memoized_figure
 def create_squad_breakdown(df_squad):
     """Creates a bar chart for squad breakdown."""
+    import plotly.express as px
+    
     fig = px.bar(
         df_squad.sort_values('Total HPP', ascending=False), 
         x='Squad', 
@@ -0,0 +1,160 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Command-line module - Headless metrics and exports (cron jobs / CI, no Streamlit)
+
+Usage:
+    python cli.py metrics --mes-anterior
+    python cli.py metrics --inicio 2026-01-01 --fim 2026-01-31 --squad "Squad Alpha" --json
+    python cli.py export --formato pdf --mes-anterior --output relatorio.pdf
+    python cli.py export --formato xlsx --inicio 2026-01-01 --fim 2026-03-31 --categoria Outros
+    python cli.py batch --por squad --mes-anterior --output relatorios_squads.zip
+"""
+
+import argparse
+import json
+import sys
+from datetime import date
+
+from config import DEFAULT_CAPACITY
+from metrics import build_metrics, month_range, previous_month, score_status
+
+FORMATOS = ('pdf', 'xlsx', 'csv')
+
+
+def _parse_args(argv):
+    periodo = argparse.ArgumentParser(add_help=False)
+    periodo.add_argument("--inicio", type=date.fromisoformat, help="data inicial (AAAA-MM-DD)")
+    periodo.add_argument("--fim", type=date.fromisoformat, help="data final (AAAA-MM-DD)")
+    periodo.add_argument("--mes", help="mês inteiro (AAAA-MM)")
+    periodo.add_argument("--mes-anterior", action="store_true", help="mês anterior completo")
+    periodo.add_argument("--squad", action="append", default=[], dest="squads")
+    periodo.add_argument("--produto", action="append", default=[], dest="produtos")
+    periodo.add_argument("--categoria", action="append", default=[], dest="categorias")
+    periodo.add_argument("--tipo", action="append", default=[], dest="tipos", help="tipo de impacto")
+    periodo.add_argument("--capacidade", type=float, default=DEFAULT_CAPACITY, help="capacidade do time (h/mês)")
+
+    parser = argparse.ArgumentParser(description="B.I.T. - métricas e exportações sem a interface")
+    commands = parser.add_subparsers(dest="command", required=True)
+    metrics_cmd = commands.add_parser("metrics", parents=[periodo], help="imprime as métricas do período")
+    metrics_cmd.add_argument("--json", action="store_true", help="saída em JSON")
+    export_cmd = commands.add_parser("export", parents=[periodo], help="gera PDF, Excel ou CSV")
+    export_cmd.add_argument("--formato", choices=FORMATOS, required=True)
+    export_cmd.add_argument("--output", help="arquivo de saída (padrão: bit_<período>.<formato>)")
+    batch_cmd = commands.add_parser("batch", parents=[periodo], help="um PDF por squad/produto em um zip")
+    batch_cmd.add_argument("--por", choices=('squad', 'produto'), default='squad', help="agrupamento dos relatórios")
+    batch_cmd.add_argument("--processos", type=int, help="processos em paralelo (padrão: todos os núcleos)")
+    batch_cmd.add_argument("--output", help="arquivo de saída (padrão: bit_<por>_<período>.zip)")
+    return parser.parse_args(argv)
+
+
+def build_filters(args):
+    """Translates the period and filter arguments into a database filter set."""
+    inicio, fim = args.inicio, args.fim
+    if args.mes_anterior:
+        inicio, fim = previous_month()
+    elif args.mes:
+        ano, mes = (int(parte) for parte in args.mes.split('-'))
+        inicio, fim = month_range(ano, mes)
+    return {
+        'data_inicio': inicio,
+        'data_fim': fim,
+        'squads': args.squads,
+        'produtos': args.produtos,
+        'categorias': args.categorias,
+        'tipos': args.tipos,
+    }
+
+
+def period_label(filtros):
+    inicio, fim = filtros['data_inicio'], filtros['data_fim']
+    if inicio and fim:
+        return f"{inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}"
+    if inicio:
+        return f"desde {inicio.strftime('%d/%m/%Y')}"
+    if fim:
+        return f"até {fim.strftime('%d/%m/%Y')}"
+    return "Completo"
+
+
+def _open_database():
+    import database
+
+    database.init_database()
+    return database
+
+
+def run_metrics(args):
+    database = _open_database()
+    filtros = build_filters(args)
+    summary = database.get_incident_summary(filtros)
+    metrics = build_metrics(summary['total'], summary['total_hpp'], args.capacidade, database.get_incident_trends(filtros))
+    if args.json:
+        print(json.dumps(dict(metrics, periodo=period_label(filtros)), ensure_ascii=False))
+        return 0
+
+    print(f"Período:            {period_label(filtros)}")
+    print(f"Incidentes:         {metrics['total_incidentes']} ({metrics['inc_trend']:+d} em 7d)")
+    print(f"Total HPP:          {metrics['total_hpp']:.2f}h ({metrics['hpp_trend']:+.1f}h em 7d)")
+    print(f"Média HPP:          {metrics['media_hpp']:.2f}h")
+    print(f"Environment Score:  {metrics['environment_score']:.1f}/10 ({score_status(metrics['environment_score'])})")
+    return 0
+
+
+def run_export(args):
+    database = _open_database()
+    from exports import export_to_csv, export_to_excel, generate_pdf_report
+
+    filtros = build_filters(args)
+    output = args.output or f"bit_{_suffix(filtros)}.{args.formato}"
+    if args.formato == 'csv':
+        # Chunks are written to the file as they are read, never held as a whole
+        _print_output(output, export_to_csv(database.iter_filtered_incidents(filtros), output))
+        return 0
+
+    if args.formato == 'pdf':
+        summary = database.get_incident_summary(filtros)
+        metrics = build_metrics(summary['total'], summary['total_hpp'], args.capacidade)
+        data = generate_pdf_report(database.get_filtered_incidents(filtros), metrics, period_label(filtros))
+    else:
+        data = export_to_excel(database.iter_filtered_incidents(filtros))
+    _write_output(output, data)
+    return 0
+
+
+def run_batch(args):
+    database = _open_database()
+    from exports import generate_batch_reports
+
+    filtros = build_filters(args)
+    df = database.get_filtered_incidents(filtros)
+    data = generate_batch_reports(df, args.por, args.capacidade, period_label(filtros), args.processos)
+    _write_output(args.output or f"bit_{args.por}_{_suffix(filtros)}.zip", data)
+    return 0
+
+
+def _suffix(filtros):
+    return (filtros['data_inicio'] or date.today()).strftime('%Y%m%d')
+
+
+def _write_output(output, data):
+    with open(output, 'wb') as f:
+        f.write(data)
+    _print_output(output, len(data))
+
+
+def _print_output(output, size):
+    print(f"{output} ({size / 1024:.0f} KB)")
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    commands = {'metrics': run_metrics, 'export': run_export, 'batch': run_batch}
+    try:
+        return commands[args.command](args)
+    except Exception as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,12 +5,27 @@ Support for SQLite (local) and PostgreSQL (production)
 """
 
 import os
+import sys
+import hashlib
+import io
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 import sqlalchemy
-from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Float, DateTime, Date, Time, Boolean, text, inspect
+from sqlalchemy import create_engine, event, MetaData, Table, Column, Integer, String, Float, DateTime, Date, Time, Boolean, SmallInteger, ForeignKey, UniqueConstraint, text, inspect, select, func, and_, or_, union_all, literal, cast, null, case, true
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateTable
 from datetime import datetime
 
+from profiling import instrument_module
+from metrics import build_trends
+from migrations import MIGRATIONS, apply_migrations, read_schema_meta, write_schema_meta
+
 # Get Database URL from environment or fallback to local SQLite
 # Render/Koyeb provide DATABASE_URL. 
 # Note: SQLAlchemy requires 'postgresql://' instead of 'postgres://' (common in Heroku/Render)
@@ -18,8 +33,29 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///bit_tracker.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# Connection pool settings (ignored for in-memory SQLite, which uses a single connection)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; managed Postgres drops idle connections
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+
+def _engine_options(url):
+    options = {'echo': False, 'pool_pre_ping': DB_POOL_PRE_PING}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        return options
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
 # Initialize Engine
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 metadata = MetaData()
 
 # Define Tables
@@ -35,9 +71,43 @@ incidents = Table(
     Column('duracao', Float, nullable=False),
     Column('hpp', Float, nullable=False),
     Column('descricao', String),
-    Column('created_at', DateTime, default=datetime.now)
+    Column('created_at', DateTime, default=datetime.now),
+    Column('produto', String),
+    # Typed start timestamp and its weekday (0 = Monday) / hour, derived on write from
+    # data + hora_inicio (migration 5 backfills and indexes them). NULL hour when unknown.
+    Column('inicio', DateTime),
+    Column('dia_semana', SmallInteger),
+    Column('hora', SmallInteger),
+    # Integer references into the dimension tables (indexed by migration 4).
+    # The name columns above are kept as denormalised labels for exports and the rollup.
+    Column('squad_id', Integer, ForeignKey('squads.id', ondelete='SET NULL')),
+    Column('categoria_id', Integer, ForeignKey('categorias.id', ondelete='SET NULL')),
+    Column('tipo_impacto_id', Integer, ForeignKey('tipos_impacto.id', ondelete='SET NULL')),
+    Column('produto_id', Integer, ForeignKey('produtos.id', ondelete='SET NULL'))
 )
 
+# (name column, id column, dimension table) for every dimension referenced by incidents
+DIMENSIONS = [
+    ('squad', 'squad_id', 'squads'),
+    ('categoria', 'categoria_id', 'categorias'),
+    ('tipo_impacto', 'tipo_impacto_id', 'tipos_impacto'),
+    ('produto', 'produto_id', 'produtos'),
+]
+DIMENSION_NAME_COLUMNS = [name_col for name_col, _, _ in DIMENSIONS]
+
+# Columns derived from data/hora_inicio on write
+START_COLUMNS = ['inicio', 'dia_semana', 'hora']
+
+# Incident columns as seen by the app and exports (without the internal id references
+# and the derived start columns)
+INCIDENT_COLUMNS = [
+    c for c in incidents.c
+    if c.name not in {id_col for _, id_col, _ in DIMENSIONS} and c.name not in START_COLUMNS
+]
+
+# Columns get_all_incidents can project: the incident columns plus the derived start hour
+LOADER_COLUMNS = [c.name for c in INCIDENT_COLUMNS] + ['hora']
+
 categorias = Table(
     'categorias', metadata,
     Column('id', Integer, primary_key=True),
@@ -70,32 +140,283 @@ produtos = Table(
     Column('created_at', DateTime, default=datetime.now)
 )
 
+# Pre-aggregated totals for the dashboard, kept in sync by the incident write functions.
+# 'produto' uses '' and 'hora' uses -1 when the incident has no value, so the key stays unique.
+incident_rollup = Table(
+    'incident_rollup', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('data', Date, nullable=False),
+    Column('squad', String, nullable=False),
+    Column('categoria', String, nullable=False),
+    Column('produto', String, nullable=False, default=''),
+    Column('tipo_impacto', String, nullable=False),
+    Column('hora', Integer, nullable=False, default=-1),
+    Column('hpp', Float, nullable=False, default=0),
+    Column('duracao', Float, nullable=False, default=0),
+    Column('incidentes', Integer, nullable=False, default=0),
+    UniqueConstraint('data', 'squad', 'categoria', 'produto', 'tipo_impacto', 'hora', name='uq_incident_rollup_key')
+)
+
+ROLLUP_KEY = ['data', 'squad', 'categoria', 'produto', 'tipo_impacto', 'hora']
+
+# Single-row modification counter, bumped in the same transaction as every incident write.
+# Together with MAX(incidents.id) it forms the data version used to validate cached frames.
+data_version = Table(
+    'data_version', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('contador', Integer, nullable=False, default=0)
+)
+
+
+# Pool checkout statistics (wait times of the most recent checkouts)
+_pool_stats = {'checkouts': 0, 'timeouts': 0, 'waits': deque(maxlen=1000)}
+_pool_stats_lock = threading.Lock()
+
 
+@contextmanager
 def get_connection():
-    """Returns a database connection."""
-    return engine.connect()
+    """Checks a connection out of the pool and always returns it on exit."""
+    start = time.perf_counter()
+    try:
+        conn = engine.connect()
+    except sqlalchemy.exc.TimeoutError:
+        with _pool_stats_lock:
+            _pool_stats['timeouts'] += 1
+        raise
+    with _pool_stats_lock:
+        _pool_stats['checkouts'] += 1
+        _pool_stats['waits'].append(time.perf_counter() - start)
+    
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_pool_stats():
+    """Returns pool occupancy and checkout wait times, for sizing the pool."""
+    pool = engine.pool
+    with _pool_stats_lock:
+        waits = sorted(_pool_stats['waits'])
+        stats = {
+            'pool': type(pool).__name__,
+            'checkouts': _pool_stats['checkouts'],
+            'timeouts': _pool_stats['timeouts'],
+        }
+    for name in ('size', 'checkedout', 'overflow', 'checkedin'):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    if 'overflow' in stats:
+        # QueuePool reports negative overflow while the base pool is not full yet
+        stats['overflow'] = max(0, stats['overflow'])
+    if waits:
+        stats['wait_ms_avg'] = round(1000 * sum(waits) / len(waits), 2)
+        stats['wait_ms_p95'] = round(1000 * waits[int(0.95 * (len(waits) - 1))], 2)
+        stats['wait_ms_max'] = round(1000 * waits[-1], 2)
+    return stats
+
+
+
+# ==================== QUERY LOG ====================
+# Every statement's duration, row count and call site are kept in a rolling window;
+# statements slower than SLOW_QUERY_MS are also kept and logged with their query plan,
+# which a background worker gets by running EXPLAIN on a connection of its own.
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+QUERY_LOG_WINDOW = int(os.getenv("QUERY_LOG_WINDOW", "1000"))
+SLOW_QUERY_KEEP = 20
+
+_query_log = deque(maxlen=QUERY_LOG_WINDOW)
+_slow_queries = deque(maxlen=SLOW_QUERY_KEEP)
+_query_log_lock = threading.Lock()
+_explain_executor = None
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+
+def _call_site():
+    """First frame in the app's own modules that led to the statement, as 'file:line function'."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(_APP_DIR) and 'site-packages' not in filename
+                and os.path.basename(filename) != 'profiling.py'):
+            return f"{os.path.relpath(filename, _APP_DIR)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _explain(conn, statement, parameters):
+    """Runs EXPLAIN (EXPLAIN QUERY PLAN on SQLite) on a raw cursor of `conn`."""
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == 'sqlite' else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [str(row[-1]) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cursor.close()
 
 
-def init_database():
-    """Initializes the database schema."""
+def _get_explain_executor():
+    global _explain_executor
+    with _query_log_lock:
+        if _explain_executor is None:
+            _explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bit-explain')
+        return _explain_executor
+
+
+def _log_slow_query(slow):
+    print(f"Slow query ({slow['ms']:.0f} ms) at {slow['call_site']}: {slow['statement'][:200]}")
+    for line in slow['plan'] or []:
+        print(f"    {line}")
+
+
+def _explain_slow_query(slow, statement, parameters):
+    """Background job: explains a slow statement on a pooled connection of its own, then logs it.
+    
+    Never in the statement's listener, which would run EXPLAIN on the caller's
+    connection, inside the caller's transaction, and add its cost to the request.
+    """
     try:
-        # Create tables if not exist
-        metadata.create_all(engine)
-        
-        # Check migrations/schema updates
-        check_schema_updates()
-        
-        # Seed defaults
-        seed_initial_data()
+        with get_connection() as conn:
+            plan = _explain(conn, statement, parameters)
+    except SQLAlchemyError as e:
+        plan = [f"EXPLAIN failed: {e}"]
+    with _query_log_lock:
+        slow['plan'] = plan
+    _log_slow_query(slow)
+
+
+def _before_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_start')
+    if not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    # Drivers only know the row count of a SELECT after it is fetched (-1 until then)
+    entry = {
+        'statement': " ".join(statement.split()),
+        'ms': round(elapsed_ms, 3),
+        'rows': cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None,
+        'call_site': _call_site(),
+        'executemany': executemany,
+        'ts': datetime.now(),
+    }
+    with _query_log_lock:
+        _query_log.append(entry)
+    
+    if elapsed_ms >= SLOW_QUERY_MS:
+        slow = dict(entry, plan=None)
+        with _query_log_lock:
+            _slow_queries.append(slow)
+        if not executemany and statement.lstrip().upper().startswith(_EXPLAINABLE):
+            # Logged by the worker once the plan is known
+            _get_explain_executor().submit(_explain_slow_query, slow, statement, parameters)
+        else:
+            _log_slow_query(slow)
+
+
+if QUERY_LOG_ENABLED:
+    event.listen(engine, 'before_cursor_execute', _before_query)
+    event.listen(engine, 'after_cursor_execute', _after_query)
+
+
+def get_query_stats(top=10):
+    """Returns the `top` statements of the rolling window by total time.
+    
+    Grouped by statement and call site: calls, total/max ms and the last row count.
+    """
+    with _query_log_lock:
+        entries = list(_query_log)
+    groups = {}
+    for entry in entries:
+        stats = groups.setdefault((entry['statement'], entry['call_site']), {
+            'statement': entry['statement'], 'call_site': entry['call_site'],
+            'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': None,
+        })
+        stats['calls'] += 1
+        stats['total_ms'] += entry['ms']
+        stats['max_ms'] = max(stats['max_ms'], entry['ms'])
+        stats['rows'] = entry['rows']
+    ranked = sorted(groups.values(), key=lambda stats: stats['total_ms'], reverse=True)[:top]
+    for stats in ranked:
+        stats['avg_ms'] = round(stats['total_ms'] / stats['calls'], 3)
+        stats['total_ms'] = round(stats['total_ms'], 3)
+    return ranked
+
+
+def get_slow_queries():
+    """Returns the most recent slow statements, newest first.
+    
+    'plan' is None until the background EXPLAIN of the statement has finished.
+    """
+    with _query_log_lock:
+        return [dict(slow) for slow in reversed(_slow_queries)]
+
+
+# Process-wide initialization guard (Streamlit re-executes app.py on every interaction)
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def schema_fingerprint():
+    """Hash of the declared tables and the latest migration version."""
+    ddl = "\n".join(str(CreateTable(table).compile(engine)) for table in metadata.sorted_tables)
+    return hashlib.sha256(f"{ddl}\nmigration:{MIGRATIONS[-1][0]}".encode()).hexdigest()
+
+
+def init_database():
+    """Initializes the database schema once per process.
+    
+    DDL, reflection and migrations only run when the stored schema fingerprint
+    differs from the current one. Defaults are seeded only for a brand new
+    database; afterwards seeding is explicit via seed_initial_data().
+    """
+    global _initialized
+    if _initialized:
+        return
+    
+    with _init_lock:
+        if _initialized:
+            return
+        try:
+            fingerprint = schema_fingerprint()
+            if read_schema_meta(engine, 'schema_fingerprint') != fingerprint:
+                is_new_database = not inspect(engine).has_table('incidents')
                 
-    except Exception as e:
-        print(f"Error initializing database: {e}")
+                # Create tables if not exist
+                metadata.create_all(engine)
+                
+                # Check migrations/schema updates; on failure the fingerprint is not
+                # stored, so the next start retries the pending migrations
+                if not check_schema_updates():
+                    return
+                
+                # Backfill the dashboard rollup for databases created before it existed
+                if rollup_needs_rebuild():
+                    rebuild_rollup()
+                
+                _ensure_data_version_row()
+                
+                if is_new_database:
+                    seed_initial_data()
+                
+                write_schema_meta(engine, 'schema_fingerprint', fingerprint)
+            _initialized = True
+        except Exception as e:
+            print(f"Error initializing database: {e}")
 
 
 def seed_initial_data():
     """Seeds the database with default values if tables are empty."""
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
             # Categorias
             if conn.execute(text("SELECT COUNT(*) FROM categorias")).scalar() == 0:
                 _seed_categorias(conn)
@@ -115,6 +436,7 @@ def seed_initial_data():
             if conn.execute(text("SELECT COUNT(*) FROM produtos")).scalar() == 0:
                 _seed_produtos(conn)
                 conn.commit()
+        invalidate_reference_data()
         return True
     except Exception as e:
         print(f"Error seeding data: {e}")
@@ -122,19 +444,13 @@ def seed_initial_data():
 
 
 def check_schema_updates():
-    """Checks and applies schema updates (migrations)."""
+    """Checks and applies schema updates (migrations). Returns False if a migration failed."""
     try:
-        inspector = inspect(engine)
-        columns = [c['name'] for c in inspector.get_columns('incidents')]
-        
-        if 'produto' not in columns:
-            print("Migrating: Adding 'produto' column to incidents table...")
-            with engine.connect() as conn:
-                # Add column. SQLite and Postgres support ADD COLUMN
-                conn.execute(text("ALTER TABLE incidents ADD COLUMN produto VARCHAR"))
-                conn.commit()
+        apply_migrations(engine)
+        return True
     except Exception as e:
         print(f"Migration error: {e}")
+        return False
 
 
 def _seed_categorias(conn):
@@ -181,71 +497,163 @@ def _seed_produtos(conn):
 
 
 # ==================== INCIDENTS ====================
+def _dimension_id_values(values):
+    """Scalar subqueries resolving the dimension ids of an incident from its names."""
+    resolved = {}
+    for name_col, id_col, table_name in DIMENSIONS:
+        table = metadata.tables[table_name]
+        resolved[id_col] = select(table.c.id).where(table.c.nome == values.get(name_col)).scalar_subquery()
+    return resolved
+
+
 def insert_incident(data, hora_inicio, squad, categoria, tipo_impacto, peso, duracao, hpp, descricao, produto=None):
     """Inserts a new incident into the database."""
-    with engine.connect() as conn:
-        conn.execute(
-            incidents.insert().values(
-                data=data,
-                hora_inicio=hora_inicio,
-                squad=squad,
-                categoria=categoria,
-                tipo_impacto=tipo_impacto,
-                peso=peso,
-                duracao=duracao,
-                hpp=hpp,
-                descricao=descricao,
-                produto=produto
-            )
-        )
+    values = dict(
+        data=data,
+        hora_inicio=hora_inicio,
+        squad=squad,
+        categoria=categoria,
+        tipo_impacto=tipo_impacto,
+        peso=peso,
+        duracao=duracao,
+        hpp=hpp,
+        descricao=descricao,
+        produto=produto
+    )
+    with get_connection() as conn:
+        conn.execute(incidents.insert().values(
+            **values, **derive_start_columns(data, hora_inicio), **_dimension_id_values(values)
+        ))
+        _apply_rollup_deltas(conn, _accumulate_rollup([values]))
+        _bump_data_version(conn)
         conn.commit()
 
 
-def get_all_incidents():
-    """Returns all incidents as DataFrame."""
-    try:
-        # Use pandas read_sql with the engine directly
-        # ORDER BY is handled by SQL or pandas
-        df = pd.read_sql(
-            text("SELECT * FROM incidents ORDER BY data DESC, created_at DESC"),
-            engine.connect()
+def get_all_incidents(columns=None):
+    """Returns all incidents as DataFrame (shared cached copy, do not mutate).
+    
+    `columns` restricts the load to the given INCIDENT_COLUMNS names, plus the stored
+    start 'hora' (int8, -1 when unknown). Measures come back as float32,
+    dimensions as category and data as datetime64.
+    """
+    columns = list(columns) if columns is not None else [c.name for c in INCIDENT_COLUMNS]
+    unknown = set(columns) - set(LOADER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown incident columns: {', '.join(sorted(unknown))}")
+    
+    def load():
+        stmt = select(*_projection(columns)).order_by(
+            incidents.c.data.desc(), incidents.c.created_at.desc()
         )
-        return df
+        with get_connection() as conn:
+            df = pd.read_sql(stmt, conn)
+        return _compact_dtypes(_decode_dimensions(df))[columns]
+    
+    name = 'incidents' if columns == [c.name for c in INCIDENT_COLUMNS] else f"incidents:{','.join(columns)}"
+    try:
+        return _cached_frame(name, load)
     except Exception as e:
         print(f"Error reading incidents: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(columns=columns)
+
+
+def _projection(columns):
+    """SELECT list for the requested loader columns."""
+    selected = []
+    for name_col, id_col, _ in DIMENSIONS:
+        if name_col in columns:
+            # Dimensions travel as integer ids; the name is only read for rows without an id
+            selected.append(incidents.c[id_col])
+            selected.append(case((incidents.c[id_col].is_(None), incidents.c[name_col])).label(f"{name_col}_legacy"))
+    for column in columns:
+        if column == 'hora':
+            selected.append(func.coalesce(incidents.c.hora, -1).label('hora'))
+        elif column not in DIMENSION_NAME_COLUMNS:
+            selected.append(incidents.c[column])
+    return selected
+
+
+def _compact_dtypes(df):
+    """Downcasts a loaded incidents frame (dimensions are already categorical)."""
+    if 'data' in df.columns:
+        df['data'] = pd.to_datetime(df['data'])
+    if 'created_at' in df.columns:
+        df['created_at'] = pd.to_datetime(df['created_at'])
+    for column in ('peso', 'duracao', 'hpp'):
+        if column in df.columns:
+            df[column] = df[column].astype('float32')
+    if 'id' in df.columns:
+        df['id'] = df['id'].astype('int32')
+    if 'hora' in df.columns:
+        df['hora'] = df['hora'].astype('int8')
+    return df
+
+
+def _dimension_categorical(ids, legacy, names_by_id):
+    """Builds a Categorical whose codes come straight from the dimension ids.
+    
+    Rows whose id is unknown fall back to the stored name (`legacy`).
+    """
+    categories = list(names_by_id.values())
+    codes = pd.Index(list(names_by_id), dtype='float64').get_indexer(ids.astype('float64'))
+    missing = codes == -1
+    if missing.any():
+        fallback = legacy[missing]
+        categories += [nome for nome in fallback.dropna().unique() if nome not in names_by_id.values()]
+        codes[missing] = pd.Index(categories).get_indexer(fallback)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def _decode_dimensions(df):
+    """Replaces the *_id/*_legacy column pairs by Categorical name columns."""
+    reference = get_reference_data()
+    unknown = any(
+        not set(df[id_col].dropna().astype(int)).issubset(reference['ids'][table_name])
+        for _, id_col, table_name in DIMENSIONS if id_col in df.columns
+    )
+    if unknown:
+        # A dimension row was added by another replica after our cache was loaded
+        invalidate_reference_data()
+        reference = get_reference_data()
+    
+    for name_col, id_col, table_name in DIMENSIONS:
+        if id_col not in df.columns:
+            continue
+        df[name_col] = _dimension_categorical(df[id_col], df[f"{name_col}_legacy"], reference['ids'][table_name])
+        df = df.drop(columns=[id_col, f"{name_col}_legacy"])
+    return df
 
 
 def delete_incident(incident_id):
     """Deletes an incident by ID."""
-    try:
-        with engine.connect() as conn:
-            conn.execute(
-                incidents.delete().where(incidents.c.id == incident_id)
-            )
-            conn.commit()
-        return True
-    except SQLAlchemyError:
-        return False
+    return delete_many_incidents([incident_id])
 
 
 def update_incident(incident_id, data, hora_inicio, squad, categoria, tipo_impacto, peso, duracao, hpp, descricao, produto=None):
     """Updates an existing incident."""
+    values = dict(
+        data=data,
+        hora_inicio=str(hora_inicio),
+        squad=squad,
+        categoria=categoria,
+        tipo_impacto=tipo_impacto,
+        peso=peso,
+        duracao=duracao,
+        hpp=hpp,
+        descricao=descricao,
+        produto=produto
+    )
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
+            old_rows = _select_rollup_sources(conn, [incident_id])
             stmt = incidents.update().where(incidents.c.id == incident_id).values(
-                data=data,
-                hora_inicio=str(hora_inicio),
-                squad=squad,
-                categoria=categoria,
-                tipo_impacto=tipo_impacto,
-                peso=peso,
-                duracao=duracao,
-                hpp=hpp,
-                descricao=descricao,
-                produto=produto
+                **values, **derive_start_columns(data, values['hora_inicio']), **_dimension_id_values(values)
             )
             conn.execute(stmt)
+            if old_rows:
+                _apply_rollup_deltas(conn, _accumulate_rollup(old_rows, sign=-1))
+                _apply_rollup_deltas(conn, _accumulate_rollup([values]))
+            _bump_data_version(conn)
             conn.commit()
         return True
     except SQLAlchemyError:
@@ -256,31 +664,651 @@ def update_incident(incident_id, data, hora_inicio, squad, categoria, tipo_impac
 def delete_many_incidents(incident_ids):
     """Deletes multiple incidents by ID list."""
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
+            old_rows = _select_rollup_sources(conn, incident_ids)
             stmt = incidents.delete().where(incidents.c.id.in_(incident_ids))
             conn.execute(stmt)
+            _apply_rollup_deltas(conn, _accumulate_rollup(old_rows, sign=-1))
+            _bump_data_version(conn)
             conn.commit()
         return True
     except SQLAlchemyError:
         return False
 
 
+# ==================== BULK IMPORT ====================
+BULK_INSERT_COLUMNS = [
+    'data', 'hora_inicio', 'squad', 'categoria', 'tipo_impacto',
+    'peso', 'duracao', 'hpp', 'descricao', 'produto', 'created_at',
+    'inicio', 'dia_semana', 'hora', 'squad_id', 'categoria_id', 'tipo_impacto_id', 'produto_id'
+]
+
+
+def _copy_field(value):
+    # Values are always quoted, so only the unquoted \N marker reads back as NULL
+    return r'\N' if value is None else '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_incidents(conn, rows):
+    """Loads rows with PostgreSQL COPY through the raw psycopg2 cursor.
+    
+    None is sent as NULL and '' as an empty string, exactly what the executemany
+    path stores.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_copy_field(row[col]) for col in BULK_INSERT_COLUMNS) + "\n")
+    buffer.seek(0)
+    
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY incidents ({', '.join(BULK_INSERT_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_incident_batch(conn, rows):
+    if engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2':
+        _copy_incidents(conn, rows)
+    else:
+        conn.execute(incidents.insert(), rows)
+    _apply_rollup_deltas(conn, _accumulate_rollup(rows))
+    _bump_data_version(conn)
+
+
+def bulk_insert_incidents(records, batch_size=1000):
+    """Inserts validated incidents in batches (executemany, or COPY on PostgreSQL).
+    
+    Each batch commits on its own together with its rollup and data version updates.
+    A failing batch is retried row by row so one bad row does not abort the load.
+    `records` is a DataFrame as returned by importer.validate_incidents; the optional
+    'linha' column is used to report errors.
+    
+    Returns (inserted_count, [(linha, mensagem), ...]).
+    """
+    now = datetime.now()
+    dimension_ids = _load_dimension_ids()
+    rows = []
+    for record in records.to_dict('records'):
+        row = {col: None if pd.isna(record.get(col)) else record.get(col) for col in BULK_INSERT_COLUMNS}
+        row['created_at'] = now
+        row.update(derive_start_columns(row['data'], row['hora_inicio']))
+        for name_col, id_col, table_name in DIMENSIONS:
+            row[id_col] = dimension_ids[table_name].get(row[name_col])
+        row['_linha'] = record.get('linha')
+        rows.append(row)
+    
+    inserted = 0
+    errors = []
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        values = [{col: row[col] for col in BULK_INSERT_COLUMNS} for row in batch]
+        try:
+            with get_connection() as conn, conn.begin():
+                _insert_incident_batch(conn, values)
+            inserted += len(batch)
+            continue
+        except SQLAlchemyError:
+            pass
+        
+        for row, value in zip(batch, values):
+            try:
+                with get_connection() as conn, conn.begin():
+                    conn.execute(incidents.insert(), [value])
+                    _apply_rollup_deltas(conn, _accumulate_rollup([value]))
+                    _bump_data_version(conn)
+                inserted += 1
+            except SQLAlchemyError as e:
+                errors.append((row['_linha'], f"Erro ao gravar: {e.__class__.__name__}"))
+    return inserted, errors
+
+
+def _load_dimension_ids():
+    """Returns {table name: {nome: id}} read straight from the database (no cache)."""
+    result = {}
+    with get_connection() as conn:
+        for _, _, table_name in DIMENSIONS:
+            table = metadata.tables[table_name]
+            result[table_name] = dict(conn.execute(select(table.c.nome, table.c.id)).fetchall())
+    return result
+
+
+# ==================== HISTÓRICO QUERIES ====================
+# Sortable columns of the Histórico table (UI key -> column)
+HISTORY_SORT_COLUMNS = {
+    'data': incidents.c.data,
+    'hpp': incidents.c.hpp,
+    'duracao': incidents.c.duracao,
+    'squad': incidents.c.squad,
+    'categoria': incidents.c.categoria,
+}
+
+
+# Filter key -> (incident name column, dimension table)
+FILTER_DIMENSIONS = [
+    ('squads', 'squad', squads),
+    ('produtos', 'produto', produtos),
+    ('categorias', 'categoria', categorias),
+    ('tipos', 'tipo_impacto', tipos_impacto),
+]
+
+
+def _incident_filter_clauses(filters):
+    """Translates a filter set into WHERE clauses.
+
+    filters keys: data_inicio, data_fim, squads, produtos, categorias, tipos.
+    """
+    filters = filters or {}
+    clauses = []
+    if filters.get('data_inicio'):
+        clauses.append(incidents.c.data >= filters['data_inicio'])
+    if filters.get('data_fim'):
+        clauses.append(incidents.c.data <= filters['data_fim'])
+    # Names are resolved to ids in SQL so the indexed integer columns are used; rows
+    # without a dimension row (legacy or deleted names) match on the stored name
+    for key, name_col, table in FILTER_DIMENSIONS:
+        if filters.get(key):
+            names = list(filters[key])
+            id_col = incidents.c[f"{name_col}_id"]
+            clauses.append(or_(
+                id_col.in_(select(table.c.id).where(table.c.nome.in_(names))),
+                and_(id_col.is_(None), incidents.c[name_col].in_(names))
+            ))
+    return clauses
+
+
+def get_filter_options():
+    """Returns the names offered by each filter key (see _incident_filter_clauses), sorted.
+    
+    The reference tables plus the names stored on incidents without a dimension row,
+    so legacy or deleted values can still be selected.
+    """
+    def load():
+        with get_connection() as conn:
+            return {
+                key: [nome for (nome,) in conn.execute(
+                    select(incidents.c[name_col]).distinct().where(
+                        incidents.c[f"{name_col}_id"].is_(None), incidents.c[name_col].isnot(None)
+                    )
+                ) if nome]
+                for key, name_col, _ in FILTER_DIMENSIONS
+            }
+    
+    try:
+        orphans = _cached_frame('filter_options', load)
+    except Exception as e:
+        print(f"Error reading filter options: {e}")
+        orphans = {}
+    reference = get_reference_data()
+    return {
+        key: sorted(set(reference[reference_key]) | set(orphans.get(key, [])))
+        for (key, _, _), reference_key in zip(FILTER_DIMENSIONS, ('squads', 'produtos', 'categorias', 'tipos_impacto'))
+    }
+
+
+def get_incident_date_range():
+    """Returns (min, max) incident dates, or (None, None) when there are no incidents."""
+    with get_connection() as conn:
+        row = conn.execute(select(func.min(incidents.c.data), func.max(incidents.c.data))).one()
+        return row[0], row[1]
+
+
+def get_incidents_page(filters=None, sort_column='data', ascending=False, page_size=25, cursor=None):
+    """Returns one page of filtered incidents, the filtered totals and the next cursor.
+
+    Uses keyset pagination on (sort column, id): `cursor` is the (sort value, id) of the
+    last row of the previous page, so any page costs the same as the first one.
+    """
+    sort_col = HISTORY_SORT_COLUMNS.get(sort_column, incidents.c.data)
+    clauses = _incident_filter_clauses(filters)
+    
+    page_clauses = list(clauses)
+    if cursor is not None:
+        last_value, last_id = cursor
+        if ascending:
+            page_clauses.append(or_(sort_col > last_value, and_(sort_col == last_value, incidents.c.id > last_id)))
+        else:
+            page_clauses.append(or_(sort_col < last_value, and_(sort_col == last_value, incidents.c.id < last_id)))
+    
+    order = (sort_col.asc(), incidents.c.id.asc()) if ascending else (sort_col.desc(), incidents.c.id.desc())
+    page_stmt = select(*INCIDENT_COLUMNS).where(*page_clauses).order_by(*order).limit(page_size)
+    
+    try:
+        with get_connection() as conn:
+            total, total_hpp = conn.execute(_summary_statement(clauses)).one()
+            df = pd.read_sql(page_stmt, conn)
+    except Exception as e:
+        print(f"Error reading incidents page: {e}")
+        return pd.DataFrame(), {'total': 0, 'total_hpp': 0.0}, None
+    
+    next_cursor = None
+    if len(df) == page_size:
+        last = df.iloc[-1]
+        next_cursor = (last[sort_col.name], int(last['id']))
+    return df, {'total': int(total), 'total_hpp': float(total_hpp)}, next_cursor
+
+
+def _summary_statement(clauses):
+    return select(func.count(), func.coalesce(func.sum(incidents.c.hpp), 0)).where(*clauses)
+
+
+def get_incident_summary(filters=None):
+    """Returns {'total', 'total_hpp'} of the incidents matching the filter set."""
+    with get_connection() as conn:
+        total, total_hpp = conn.execute(_summary_statement(_incident_filter_clauses(filters))).one()
+    return {'total': int(total), 'total_hpp': float(total_hpp)}
+
+
+def get_incident_trends(filters=None):
+    """Returns the 7-day windows (metrics.TREND_WINDOWS) of the incidents matching the filter set.
+    
+    Same windows as get_dashboard_kpis, ending at the latest matching incident date.
+    """
+    clauses = _incident_filter_clauses(filters)
+    ultima = select(func.max(incidents.c.data).label('ultima')).where(*clauses).subquery()
+    recentes = incidents.c.data >= _days_before(ultima.c.ultima, 7)
+    anteriores = and_(incidents.c.data >= _days_before(ultima.c.ultima, 14), incidents.c.data < _days_before(ultima.c.ultima, 7))
+    stmt = select(
+        func.coalesce(func.sum(case((recentes, incidents.c.hpp), else_=0)), 0).label('hpp_7d'),
+        func.coalesce(func.sum(case((recentes, 1), else_=0)), 0).label('incidentes_7d'),
+        func.coalesce(func.sum(case((anteriores, incidents.c.hpp), else_=0)), 0).label('hpp_7d_anterior'),
+        func.coalesce(func.sum(case((anteriores, 1), else_=0)), 0).label('incidentes_7d_anterior'),
+    ).select_from(incidents.join(ultima, true())).where(*clauses)
+    with get_connection() as conn:
+        row = conn.execute(stmt).mappings().one()
+    return {key: int(value) if 'incidentes' in key else float(value) for key, value in row.items()}
+
+
+def get_filtered_incidents(filters=None):
+    """Returns every incident matching the filter set as DataFrame."""
+    stmt = select(*INCIDENT_COLUMNS).where(*_incident_filter_clauses(filters)).order_by(
+        incidents.c.data.desc(), incidents.c.created_at.desc()
+    )
+    try:
+        with get_connection() as conn:
+            return pd.read_sql(stmt, conn)
+    except Exception as e:
+        print(f"Error reading incidents: {e}")
+        return pd.DataFrame()
+
+
+def iter_filtered_incidents(filters=None, chunk_size=5000):
+    """Yields the incidents matching the filter set as DataFrame chunks.
+    
+    Rows come from a server-side cursor (stream_results/yield_per), so memory stays
+    bounded by chunk_size regardless of how many rows match. When nothing matches a
+    single empty chunk with the result columns is yielded.
+    """
+    stmt = select(*INCIDENT_COLUMNS).where(*_incident_filter_clauses(filters)).order_by(
+        incidents.c.data.desc(), incidents.c.created_at.desc()
+    )
+    with get_connection() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+        columns = list(result.keys())
+        empty = True
+        for partition in result.partitions():
+            empty = False
+            yield pd.DataFrame(partition, columns=columns)
+        if empty:
+            # Still one (empty) chunk, so exports can write their header row
+            yield pd.DataFrame(columns=columns)
+
+
+# ==================== DASHBOARD ROLLUP ====================
+def parse_hora_inicio(hora_inicio):
+    """Parses an 'HH:MM' start time into (horas, minutos); None when missing or invalid.
+    
+    Shared by the rollup hour bucket and the typed start columns, so both agree.
+    """
+    partes = str(hora_inicio).split(':') if hora_inicio is not None else []
+    if len(partes) >= 2 and partes[0].strip().isdigit() and partes[1].strip().isdigit():
+        horas, minutos = int(partes[0]), int(partes[1])
+        if 0 <= horas <= 23 and 0 <= minutos <= 59:
+            return horas, minutos
+    return None
+
+
+def _hora_bucket(hora_inicio):
+    """Returns the hour of an 'HH:MM' start time, or -1 when it is unknown."""
+    parsed = parse_hora_inicio(hora_inicio)
+    return parsed[0] if parsed else -1
+
+
+def derive_start_columns(data, hora_inicio):
+    """Returns the typed start columns (inicio, dia_semana, hora) for a date and 'HH:MM'."""
+    dia = pd.Timestamp(data)
+    inicio = hora = None
+    parsed = parse_hora_inicio(hora_inicio)
+    if parsed:
+        hora, minutos = parsed
+        inicio = (dia + pd.Timedelta(hours=hora, minutes=minutos)).to_pydatetime()
+    return dict(inicio=inicio, dia_semana=int(dia.dayofweek), hora=hora)
+
+
+def _accumulate_rollup(rows, sign=1):
+    """Groups incident rows into rollup deltas keyed by ROLLUP_KEY."""
+    deltas = {}
+    for row in rows:
+        key = (
+            row['data'], row['squad'], row['categoria'], row['produto'] or '',
+            row['tipo_impacto'], _hora_bucket(row['hora_inicio'])
+        )
+        delta = deltas.setdefault(key, [0.0, 0.0, 0])
+        delta[0] += sign * row['hpp']
+        delta[1] += sign * row['duracao']
+        delta[2] += sign
+    return deltas
+
+
+def _select_rollup_sources(conn, incident_ids=None):
+    """Reads the rollup-relevant columns of the given incidents (all of them when None)."""
+    stmt = select(
+        incidents.c.data, incidents.c.hora_inicio, incidents.c.squad, incidents.c.categoria,
+        incidents.c.produto, incidents.c.tipo_impacto, incidents.c.hpp, incidents.c.duracao
+    )
+    if incident_ids is not None:
+        stmt = stmt.where(incidents.c.id.in_(incident_ids))
+    return conn.execute(stmt).mappings().all()
+
+
+def _dialect_insert(table):
+    """Returns an INSERT construct supporting ON CONFLICT for the current backend."""
+    if engine.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def _apply_rollup_deltas(conn, deltas):
+    """Upserts rollup deltas inside the caller's transaction and drops emptied buckets."""
+    if not deltas:
+        return
+    params = [
+        dict(zip(ROLLUP_KEY, key), hpp=hpp, duracao=duracao, incidentes=count)
+        for key, (hpp, duracao, count) in deltas.items()
+    ]
+    stmt = _dialect_insert(incident_rollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=ROLLUP_KEY,
+        set_={
+            'hpp': incident_rollup.c.hpp + stmt.excluded.hpp,
+            'duracao': incident_rollup.c.duracao + stmt.excluded.duracao,
+            'incidentes': incident_rollup.c.incidentes + stmt.excluded.incidentes,
+        }
+    )
+    conn.execute(stmt, params)
+    
+    if any(count < 0 for _, _, count in deltas.values()):
+        conn.execute(incident_rollup.delete().where(incident_rollup.c.incidentes <= 0))
+
+
+def rollup_needs_rebuild():
+    """True when incidents exist but the rollup table is still empty."""
+    with get_connection() as conn:
+        if conn.execute(select(func.count()).select_from(incident_rollup)).scalar():
+            return False
+        return bool(conn.execute(select(func.count()).select_from(incidents)).scalar())
+
+
+def rebuild_rollup():
+    """Recomputes the whole rollup table from the incidents table."""
+    try:
+        with get_connection() as conn:
+            rows = _select_rollup_sources(conn)
+            conn.execute(incident_rollup.delete())
+            _apply_rollup_deltas(conn, _accumulate_rollup(rows))
+            _bump_data_version(conn)
+            conn.commit()
+        return True
+    except SQLAlchemyError as e:
+        print(f"Error rebuilding rollup: {e}")
+        return False
+
+
+def get_dashboard_rollup():
+    """Returns the pre-aggregated dashboard rollup as DataFrame (shared cached copy, do not mutate)."""
+    def load():
+        with get_connection() as conn:
+            df = pd.read_sql(
+                select(
+                    incident_rollup.c.data, incident_rollup.c.squad, incident_rollup.c.categoria,
+                    incident_rollup.c.produto, incident_rollup.c.tipo_impacto, incident_rollup.c.hora,
+                    incident_rollup.c.hpp, incident_rollup.c.duracao, incident_rollup.c.incidentes
+                ),
+                conn
+            )
+        df['data'] = pd.to_datetime(df['data'])
+        return df
+    
+    try:
+        return _cached_frame('rollup', load)
+    except Exception as e:
+        print(f"Error reading rollup: {e}")
+        return pd.DataFrame()
+
+
+def _days_before(date_expr, days):
+    """Dialect-specific `date - N days` expression."""
+    if engine.dialect.name == 'sqlite':
+        return func.date(date_expr, f'-{days} days')
+    return date_expr - days
+
+
+def get_dashboard_kpis():
+    """Returns the dashboard metric card values in a single round trip.
+    
+    Conditional aggregation over the rollup: totals, plus HPP and incident counts for
+    the last 7 days up to the latest incident date and for the 7 days before that.
+    Trends are 0 when the previous window is empty, as the dashboard always showed.
+    """
+    def load():
+        r = incident_rollup
+        ultima = select(func.max(r.c.data).label('ultima')).subquery()
+        recentes = r.c.data >= _days_before(ultima.c.ultima, 7)
+        anteriores = and_(r.c.data >= _days_before(ultima.c.ultima, 14), r.c.data < _days_before(ultima.c.ultima, 7))
+        stmt = select(
+            func.coalesce(func.sum(r.c.hpp), 0).label('total_hpp'),
+            func.coalesce(func.sum(r.c.incidentes), 0).label('total_incidentes'),
+            func.coalesce(func.sum(case((recentes, r.c.hpp), else_=0)), 0).label('hpp_7d'),
+            func.coalesce(func.sum(case((recentes, r.c.incidentes), else_=0)), 0).label('incidentes_7d'),
+            func.coalesce(func.sum(case((anteriores, r.c.hpp), else_=0)), 0).label('hpp_7d_anterior'),
+            func.coalesce(func.sum(case((anteriores, r.c.incidentes), else_=0)), 0).label('incidentes_7d_anterior'),
+        ).select_from(r.join(ultima, true()))
+        with get_connection() as conn:
+            row = conn.execute(stmt).mappings().one()
+        
+        kpis = {key: int(value) if 'incidentes' in key else float(value) for key, value in row.items()}
+        kpis['media_hpp'] = kpis['total_hpp'] / kpis['total_incidentes'] if kpis['total_incidentes'] else 0.0
+        kpis.update(build_trends(kpis))
+        return kpis
+    
+    try:
+        return _cached_frame('kpis', load)
+    except Exception as e:
+        print(f"Error reading dashboard KPIs: {e}")
+        return dict.fromkeys(KPI_KEYS, 0)
+
+
+KPI_KEYS = [
+    'total_hpp', 'total_incidentes', 'media_hpp', 'hpp_7d', 'incidentes_7d',
+    'hpp_7d_anterior', 'incidentes_7d_anterior', 'hpp_trend', 'inc_trend',
+]
+
+
+def get_heatmap_matrix():
+    """Returns HPP summed by weekday x start hour as a dense 7x24 array (rows Monday..Sunday).
+    
+    A single GROUP BY over the indexed dia_semana/hora columns. Incidents without a
+    start hour are counted at 12h, as the dashboard always did.
+    """
+    def load():
+        hora = func.coalesce(incidents.c.hora, 12)
+        stmt = select(incidents.c.dia_semana, hora, func.sum(incidents.c.hpp)).group_by(incidents.c.dia_semana, hora)
+        matrix = np.zeros((7, 24))
+        with get_connection() as conn:
+            for dia_semana, hora_valor, hpp in conn.execute(stmt):
+                if dia_semana is not None:
+                    matrix[dia_semana, hora_valor] = hpp
+        return matrix
+    
+    try:
+        return _cached_frame('heatmap', load)
+    except Exception as e:
+        print(f"Error reading heatmap: {e}")
+        return np.zeros((7, 24))
+
+
+# ==================== DATA VERSION & FRAME CACHE ====================
+# Process-wide cache of loaded frames: name -> (data version, DataFrame).
+# Every session gets the same object, so callers must copy before mutating.
+_frame_cache = {}
+_frame_cache_lock = threading.Lock()
+
+
+def _ensure_data_version_row():
+    with get_connection() as conn:
+        if conn.execute(select(data_version.c.id).where(data_version.c.id == 1)).first() is None:
+            conn.execute(data_version.insert().values(id=1, contador=0))
+            conn.commit()
+
+
+def _bump_data_version(conn):
+    """Increments the modification counter inside the caller's transaction."""
+    conn.execute(data_version.update().where(data_version.c.id == 1).values(contador=data_version.c.contador + 1))
+
+
+def get_data_version():
+    """Returns the current data version token: (MAX(incidents.id), modification counter)."""
+    stmt = select(
+        select(func.max(incidents.c.id)).scalar_subquery(),
+        select(data_version.c.contador).where(data_version.c.id == 1).scalar_subquery()
+    )
+    with get_connection() as conn:
+        return tuple(conn.execute(stmt).one())
+
+
+def _cached_frame(name, loader):
+    """Returns the cached frame for `name`, reloading it when the data version changed.
+    
+    On a hit the version check is the only database query.
+    """
+    version = get_data_version()
+    with _frame_cache_lock:
+        cached = _frame_cache.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    
+    df = loader()
+    with _frame_cache_lock:
+        _frame_cache[name] = (version, df)
+    return df
+
+
+def clear_frame_cache():
+    """Drops every cached frame (the next read of each one goes to the database)."""
+    with _frame_cache_lock:
+        _frame_cache.clear()
+
+
+# ==================== REFERENCE DATA ====================
+# Seconds a cached copy of the dimension tables is trusted. Writes made through this
+# process invalidate it immediately; the TTL covers writes made by other replicas.
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "60"))
+
+_reference_cache = {'data': None, 'loaded_at': 0.0}
+_reference_lock = threading.Lock()
+
+
+def _load_reference_data():
+    """Reads categorias, tipos de impacto, squads and produtos in a single round trip."""
+    stmt = union_all(
+        select(literal('categorias').label('tabela'), categorias.c.id, categorias.c.nome, cast(null(), Float).label('peso'), categorias.c.is_default),
+        select(literal('tipos_impacto'), tipos_impacto.c.id, tipos_impacto.c.nome, tipos_impacto.c.peso, tipos_impacto.c.is_default),
+        select(literal('squads'), squads.c.id, squads.c.nome, cast(null(), Float), squads.c.is_default),
+        select(literal('produtos'), produtos.c.id, produtos.c.nome, cast(null(), Float), literal(False)),
+    )
+    with get_connection() as conn:
+        rows = conn.execute(stmt).fetchall()
+    
+    grouped = {'categorias': [], 'tipos_impacto': [], 'squads': [], 'produtos': []}
+    ids = {tabela: {} for tabela in grouped}
+    for tabela, id_, nome, peso, is_default in rows:
+        grouped[tabela].append((nome, peso, bool(is_default)))
+        ids[tabela][id_] = nome
+    
+    # Same ordering the individual getters used to apply in SQL
+    return {
+        'categorias': [nome for nome, _, _ in sorted(grouped['categorias'], key=lambda r: (not r[2], r[0]))],
+        'tipos_impacto': {nome: peso for nome, peso, _ in sorted(grouped['tipos_impacto'], key=lambda r: -r[1])},
+        'squads': sorted(nome for nome, _, _ in grouped['squads']),
+        'produtos': sorted(nome for nome, _, _ in grouped['produtos']),
+        # {table: {id: nome}} in id order, used to decode incident dimension ids
+        'ids': {tabela: dict(sorted(by_id.items())) for tabela, by_id in ids.items()},
+    }
+
+
+def get_reference_data():
+    """Returns the cached dimension tables, reloading them when stale.
+    
+    The returned structure is shared between sessions; callers must not mutate it.
+    """
+    with _reference_lock:
+        expired = time.monotonic() - _reference_cache['loaded_at'] > REFERENCE_CACHE_TTL
+        if _reference_cache['data'] is None or expired:
+            _reference_cache['data'] = _load_reference_data()
+            _reference_cache['loaded_at'] = time.monotonic()
+        return _reference_cache['data']
+
+
+def invalidate_reference_data():
+    """Drops the cached dimension tables after a write."""
+    with _reference_lock:
+        _reference_cache['data'] = None
+
+
+# ==================== DIMENSION WRITES ====================
+def _rename_dimension(conn, table, name_col, nome_antigo, nome_novo):
+    """Propagates a dimension rename to the incidents and the rollup (caller's transaction)."""
+    if nome_antigo == nome_novo:
+        return
+    id_col = f"{name_col}_id"
+    dimension_id = select(table.c.id).where(table.c.nome == nome_novo).scalar_subquery()
+    conn.execute(
+        incidents.update()
+        .where(or_(incidents.c[id_col] == dimension_id, incidents.c[name_col] == nome_antigo))
+        .values({name_col: nome_novo, id_col: dimension_id})
+    )
+    conn.execute(
+        incident_rollup.update().where(incident_rollup.c[name_col] == nome_antigo).values({name_col: nome_novo})
+    )
+    _bump_data_version(conn)
+
+
+def _detach_dimension(conn, table, id_col, nome):
+    """ON DELETE SET NULL done explicitly, since SQLite does not enforce foreign keys by default.
+    
+    Incidents keep the stored name, which the loader falls back to.
+    """
+    dimension_id = select(table.c.id).where(table.c.nome == nome).scalar_subquery()
+    conn.execute(incidents.update().where(incidents.c[id_col] == dimension_id).values({id_col: None}))
+    _bump_data_version(conn)
+
+
 # ==================== CATEGORIAS ====================
 def get_categorias():
     """Returns list of categories."""
-    with engine.connect() as conn:
-        result = conn.execute(
-            text("SELECT nome FROM categorias ORDER BY is_default DESC, nome")
-        ).fetchall()
-        return [row[0] for row in result] if result else []
+    return list(get_reference_data()['categorias'])
 
 
 def add_categoria(nome):
     """Adds a new category."""
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
             conn.execute(categorias.insert().values(nome=nome))
             conn.commit()
+        invalidate_reference_data()
         return True
     except SQLAlchemyError:
         return False
@@ -288,28 +1316,27 @@ def add_categoria(nome):
 
 def delete_categoria(nome):
     """Removes a category."""
-    with engine.connect() as conn:
+    with get_connection() as conn:
+        _detach_dimension(conn, categorias, 'categoria_id', nome)
         conn.execute(categorias.delete().where(categorias.c.nome == nome))
         conn.commit()
+    invalidate_reference_data()
     return True
 
 
 # ==================== TIPOS DE IMPACTO ====================
 def get_tipos_impacto():
     """Returns dictionary of impact types with weights."""
-    with engine.connect() as conn:
-        result = conn.execute(
-            text("SELECT nome, peso FROM tipos_impacto ORDER BY peso DESC")
-        ).fetchall()
-        return {row[0]: row[1] for row in result} if result else {}
+    return dict(get_reference_data()['tipos_impacto'])
 
 
 def add_tipo_impacto(nome, peso):
     """Adds a new impact type."""
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
             conn.execute(tipos_impacto.insert().values(nome=nome, peso=peso))
             conn.commit()
+        invalidate_reference_data()
         return True
     except SQLAlchemyError:
         return False
@@ -317,28 +1344,27 @@ def add_tipo_impacto(nome, peso):
 
 def delete_tipo_impacto(nome):
     """Removes an impact type."""
-    with engine.connect() as conn:
+    with get_connection() as conn:
+        _detach_dimension(conn, tipos_impacto, 'tipo_impacto_id', nome)
         conn.execute(tipos_impacto.delete().where(tipos_impacto.c.nome == nome))
         conn.commit()
+    invalidate_reference_data()
     return True
 
 
 # ==================== SQUADS ====================
 def get_squads():
     """Returns list of squads."""
-    with engine.connect() as conn:
-        result = conn.execute(
-            text("SELECT nome FROM squads ORDER BY nome")
-        ).fetchall()
-        return [row[0] for row in result] if result else []
+    return list(get_reference_data()['squads'])
 
 
 def add_squad(nome):
     """Adds a new squad."""
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
             conn.execute(squads.insert().values(nome=nome))
             conn.commit()
+        invalidate_reference_data()
         return True
     except SQLAlchemyError:
         return False
@@ -346,28 +1372,27 @@ def add_squad(nome):
 
 def delete_squad(nome):
     """Removes a squad."""
-    with engine.connect() as conn:
+    with get_connection() as conn:
+        _detach_dimension(conn, squads, 'squad_id', nome)
         conn.execute(squads.delete().where(squads.c.nome == nome))
         conn.commit()
+    invalidate_reference_data()
     return True
 
 
 # ==================== PRODUTOS ====================
 def get_produtos():
     """Returns list of products."""
-    with engine.connect() as conn:
-        result = conn.execute(
-            text("SELECT nome FROM produtos ORDER BY nome")
-        ).fetchall()
-        return [row[0] for row in result] if result else []
+    return list(get_reference_data()['produtos'])
 
 
 def add_produto(nome):
     """Adds a new product."""
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
             conn.execute(produtos.insert().values(nome=nome))
             conn.commit()
+        invalidate_reference_data()
         return True
     except SQLAlchemyError:
         return False
@@ -375,18 +1400,22 @@ def add_produto(nome):
 
 def delete_produto(nome):
     """Removes a product."""
-    with engine.connect() as conn:
+    with get_connection() as conn:
+        _detach_dimension(conn, produtos, 'produto_id', nome)
         conn.execute(produtos.delete().where(produtos.c.nome == nome))
         conn.commit()
+    invalidate_reference_data()
     return True
 
 def update_produto(nome_antigo, nome_novo):
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
             conn.execute(
                 produtos.update().where(produtos.c.nome == nome_antigo).values(nome=nome_novo)
             )
+            _rename_dimension(conn, produtos, 'produto', nome_antigo, nome_novo)
             conn.commit()
+        invalidate_reference_data()
         return True
     except SQLAlchemyError:
         return False
@@ -398,33 +1427,43 @@ def update_produto(nome_antigo, nome_novo):
 
 def update_squad(nome_antigo, nome_novo):
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
             conn.execute(
                 squads.update().where(squads.c.nome == nome_antigo).values(nome=nome_novo)
             )
+            _rename_dimension(conn, squads, 'squad', nome_antigo, nome_novo)
             conn.commit()
+        invalidate_reference_data()
         return True
     except SQLAlchemyError:
         return False
 
 def update_categoria(nome_antigo, nome_novo):
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
             conn.execute(
                 categorias.update().where(categorias.c.nome == nome_antigo).values(nome=nome_novo)
             )
+            _rename_dimension(conn, categorias, 'categoria', nome_antigo, nome_novo)
             conn.commit()
+        invalidate_reference_data()
         return True
     except SQLAlchemyError:
         return False
 
 def update_tipo_impacto(nome_antigo, nome_novo, peso_novo):
     try:
-        with engine.connect() as conn:
+        with get_connection() as conn:
             conn.execute(
                 tipos_impacto.update().where(tipos_impacto.c.nome == nome_antigo).values(nome=nome_novo, peso=peso_novo)
             )
+            _rename_dimension(conn, tipos_impacto, 'tipo_impacto', nome_antigo, nome_novo)
             conn.commit()
+        invalidate_reference_data()
         return True
     except SQLAlchemyError:
         return False
+
+
+# Timing spans around every public function when BIT_PROFILING is set (see profiling.py)
+instrument_module(globals(), exclude={'get_connection', 'derive_start_columns', 'parse_hora_inicio'})
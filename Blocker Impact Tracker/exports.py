@@ -1,77 +1,166 @@
 """
 B.I.T. - Blocker Impact Tracker
-Export module - PDF and Excel export functionality
+Export module - PDF, Excel and CSV export functionality
 """
 
+import hashlib
 import io
+import itertools
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.graphics.shapes import Drawing
-from reportlab.graphics.charts.piecharts import Pie
 import pandas as pd
 
+from config import DEFAULT_CAPACITY
+from metrics import build_metrics
 
-def export_to_excel(df, filename="bit_report.xlsx"):
-    """Export dataframe to Excel with formatting."""
-    output = io.BytesIO()
+# Incident columns read by generate_pdf_report (see database.get_all_incidents)
+PDF_COLUMNS = ['data', 'squad', 'categoria', 'hpp']
+
+# ==================== EXPORT KEYS ====================
+def export_cache_key(filtros, data_version, formato):
+    """Builds a hashable key from a filter set, the data version and the export format."""
+    normalized = tuple(sorted(
+        (chave, tuple(sorted(valor)) if isinstance(valor, (list, tuple, set)) else valor)
+        for chave, valor in (filtros or {}).items()
+        if valor not in (None, [], (), set())
+    ))
+    return (normalized, data_version, formato)
+
+
+def iter_csv(chunks, encoding='utf-8-sig', columns=None):
+    """Encodes DataFrame chunks as CSV, yielding one bytes block per chunk.
     
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Main data sheet
-        df_export = df.copy()
-        df_export.to_excel(writer, sheet_name='Incidentes', index=False)
-        
-        # Get workbook and worksheet
-        workbook = writer.book
-        worksheet = writer.sheets['Incidentes']
-        
-        # Auto-adjust column widths
-        for idx, col in enumerate(df_export.columns):
-            max_length = max(
-                df_export[col].astype(str).map(len).max(),
-                len(str(col))
-            ) + 2
-            worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
-        
-        # Style header row
-        from openpyxl.styles import Font, PatternFill, Alignment
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='3B82F6', end_color='3B82F6', fill_type='solid')
-        
-        for cell in worksheet[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
-        
-        # Summary sheet
-        summary_data = {
-            'Métrica': ['Total de Incidentes', 'Total HPP (h)', 'Média HPP (h)', 'Data do Relatório'],
-            'Valor': [
-                len(df),
-                f"{df['hpp'].sum():.2f}" if 'hpp' in df.columns else 'N/A',
-                f"{df['hpp'].mean():.2f}" if 'hpp' in df.columns else 'N/A',
-                datetime.now().strftime('%d/%m/%Y %H:%M')
-            ]
-        }
-        pd.DataFrame(summary_data).to_excel(writer, sheet_name='Resumo', index=False)
-        
-        # Style summary sheet
-        summary_sheet = writer.sheets['Resumo']
-        for cell in summary_sheet[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-        summary_sheet.column_dimensions['A'].width = 25
-        summary_sheet.column_dimensions['B'].width = 20
+    The header (and the BOM for utf-8-sig) is emitted once, with the first chunk;
+    without any chunk it is still emitted from `columns` when they are given.
+    """
+    first = True
+    for chunk in chunks:
+        text_chunk = chunk.to_csv(index=False, header=first)
+        yield text_chunk.encode(encoding if first else encoding.replace('-sig', ''))
+        first = False
+    if first and columns is not None:
+        yield pd.DataFrame(columns=columns).to_csv(index=False).encode(encoding)
+
+
+def write_blocks(blocks, output):
+    """Writes bytes blocks to `output` (a path or a binary file object); returns the bytes written."""
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, 'wb') as f:
+            return write_blocks(blocks, f)
+    written = 0
+    for block in blocks:
+        output.write(block)
+        written += len(block)
+    return written
+
+
+def export_to_csv(chunks, output, encoding='utf-8-sig', columns=None):
+    """Streams DataFrame chunks as CSV into `output` (a path or a binary file).
+    
+    Only one chunk is held in memory at a time. Returns the number of bytes written.
+    """
+    return write_blocks(iter_csv(chunks, encoding, columns), output)
+
+
+# Rows sampled per column to estimate Excel column widths
+EXCEL_WIDTH_SAMPLE = 1000
+
+
+def _estimate_column_widths(df):
+    """Estimates Excel column widths from a sample of rows (vectorised string lengths)."""
+    sample = df.head(EXCEL_WIDTH_SAMPLE)
+    widths = []
+    for col in sample.columns:
+        max_len = sample[col].astype('string').str.len().max() if len(sample) else 0
+        max_len = 0 if pd.isna(max_len) else int(max_len)
+        widths.append(min(max(max_len, len(str(col))) + 2, 50))
+    return widths
+
+
+def _header_cells(ws, values):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    header_font = Font(bold=True, color='FFFFFF')
+    header_fill = PatternFill(start_color='3B82F6', end_color='3B82F6', fill_type='solid')
+    
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = Alignment(horizontal='center')
+        cells.append(cell)
+    return cells
+
+
+def export_to_excel(df, filename="bit_report.xlsx", columns=None):
+    """Export dataframe to Excel with formatting.
+    
+    Uses openpyxl's write-only workbook, so rows are streamed to the file instead of
+    kept as cell objects. `df` may also be an iterable of DataFrame chunks (e.g. from
+    database.iter_filtered_incidents); the summary is accumulated in the same pass.
+    The header row is written before any row, from the first chunk or, when there is
+    none, from `columns`.
+    """
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
     
-    output.seek(0)
+    chunks = iter([df]) if isinstance(df, pd.DataFrame) else iter(df)
+    first = next(chunks, None)
+    if first is None:
+        first = pd.DataFrame(columns=columns or [])
+    
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Incidentes')
+    
+    # Column dimensions must be set before the first row in write-only mode
+    for idx, width in enumerate(_estimate_column_widths(first), start=1):
+        worksheet.column_dimensions[get_column_letter(idx)].width = width
+    worksheet.append(_header_cells(worksheet, [str(col) for col in first.columns]))
+    
+    total_rows = 0
+    total_hpp = 0.0
+    has_hpp = 'hpp' in first.columns
+    for chunk in itertools.chain([first], chunks):
+        total_rows += len(chunk)
+        if has_hpp:
+            total_hpp += float(chunk['hpp'].sum())
+        # Blank cells for NaN/NaT/None, like DataFrame.to_excel
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            worksheet.append(row)
+    
+    # Summary sheet
+    summary_sheet = workbook.create_sheet('Resumo')
+    summary_sheet.column_dimensions['A'].width = 25
+    summary_sheet.column_dimensions['B'].width = 20
+    summary_sheet.append(_header_cells(summary_sheet, ['Métrica', 'Valor']))
+    summary_rows = [
+        ('Total de Incidentes', total_rows),
+        ('Total HPP (h)', f"{total_hpp:.2f}" if has_hpp else 'N/A'),
+        ('Média HPP (h)', f"{total_hpp / total_rows:.2f}" if has_hpp and total_rows else 'N/A'),
+        ('Data do Relatório', datetime.now().strftime('%d/%m/%Y %H:%M')),
+    ]
+    for row in summary_rows:
+        summary_sheet.append(row)
+    
+    output = io.BytesIO()
+    workbook.save(output)
     return output.getvalue()
 
 
 def generate_pdf_report(df, metrics, period_label="Mensal"):
     """Generate PDF report with metrics, charts and data."""
+    # reportlab (like openpyxl) is imported on first use, off the app's cold start
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    
     buffer = io.BytesIO()
     
     # Create document
@@ -153,7 +242,7 @@ def generate_pdf_report(df, metrics, period_label="Mensal"):
     if not df.empty and 'categoria' in df.columns:
         content.append(Paragraph("📂 Top Categorias por HPP", section_style))
         
-        cat_summary = df.groupby('categoria')['hpp'].sum().sort_values(ascending=False).head(5)
+        cat_summary = df.groupby('categoria', observed=True)['hpp'].sum().sort_values(ascending=False).head(5)
         cat_data = [['Categoria', 'Total HPP']]
         for cat, hpp in cat_summary.items():
             cat_data.append([cat, f"{hpp:.2f}h"])
@@ -181,11 +270,11 @@ def generate_pdf_report(df, metrics, period_label="Mensal"):
     if not df.empty and 'squad' in df.columns:
         content.append(Paragraph("👥 Impacto por Squad", section_style))
         
-        squad_summary = df.groupby('squad')['hpp'].sum().sort_values(ascending=False)
+        # One groupby for every squad instead of a boolean mask per squad
+        squad_summary = df.groupby('squad', observed=True)['hpp'].agg(['sum', 'size']).sort_values('sum', ascending=False)
         squad_data = [['Squad', 'Total HPP', 'Incidentes']]
-        for squad in squad_summary.index:
-            squad_df = df[df['squad'] == squad]
-            squad_data.append([squad, f"{squad_df['hpp'].sum():.2f}h", str(len(squad_df))])
+        for squad, row in squad_summary.iterrows():
+            squad_data.append([squad, f"{row['sum']:.2f}h", str(int(row['size']))])
         
         squad_table = Table(squad_data, colWidths=[180, 100, 80])
         squad_table.setStyle(TableStyle([
@@ -255,3 +344,73 @@ def generate_pdf_report(df, metrics, period_label="Mensal"):
     doc.build(content)
     buffer.seek(0)
     return buffer.getvalue()
+
+
+# ==================== BATCH REPORTS ====================
+BATCH_GROUPS = ('squad', 'produto')
+
+
+def _render_group_pdf(task):
+    """Process pool worker: renders one group's PDF."""
+    nome, df_group, metrics, period_label = task
+    return nome, generate_pdf_report(df_group, metrics, period_label)
+
+
+def _slug(nome):
+    return "".join(c if c.isalnum() else "_" for c in nome).strip("_").lower() or "sem_nome"
+
+
+def _unique_name(base, usados):
+    """Returns `base`, or `base_2`, `base_3`... when another group already took it."""
+    nome, n = base, 1
+    while nome in usados:
+        n += 1
+        nome = f"{base}_{n}"
+    usados.add(nome)
+    return nome
+
+
+def generate_batch_reports(df, by='squad', capacidade=DEFAULT_CAPACITY, period_label="Mensal", processes=None):
+    """Renders one PDF per squad (or produto) and returns them in a zip with a manifest.json.
+    
+    The frame is split once with groupby; the reports are rendered in a process pool
+    (`processes` workers, all cores by default; 1 renders sequentially in this process).
+    """
+    if by not in BATCH_GROUPS:
+        raise ValueError(f"Agrupamento inválido: {by}")
+    
+    # Only the report columns are pickled to the workers
+    columns = [col for col in PDF_COLUMNS if col in df.columns]
+    tasks = []
+    for nome, grupo in df.groupby(by, observed=True, dropna=False, sort=True):
+        nome = f"Sem {by}" if pd.isna(nome) else str(nome)
+        metrics = build_metrics(len(grupo), grupo['hpp'].sum(), capacidade)
+        tasks.append((nome, grupo[columns], metrics, f"{period_label} - {nome}"))
+    
+    workers = min(processes or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        # Spawning a pool only pays off with more than one core and group
+        rendered = [_render_group_pdf(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(_render_group_pdf, tasks))
+    
+    manifest = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'periodo': period_label,
+        'agrupamento': by,
+        'capacidade': capacidade,
+        'relatorios': [],
+    }
+    output = io.BytesIO()
+    # Different names can share a slug ('Squad-A' / 'Squad A'): each entry gets its own
+    usados = set()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for (nome, pdf), (_, _, metrics, _) in zip(rendered, tasks):
+            arquivo = f"{_unique_name(f'bit_{by}_{_slug(nome)}', usados)}.pdf"
+            archive.writestr(arquivo, pdf)
+            manifest['relatorios'].append(dict(
+                metrics, nome=nome, arquivo=arquivo, bytes=len(pdf), sha256=hashlib.sha256(pdf).hexdigest()
+            ))
+        archive.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+    return output.getvalue()
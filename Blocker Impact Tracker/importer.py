@@ -0,0 +1,105 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Import module - Bulk incident import from CSV/Excel uploads
+"""
+
+from datetime import date
+import pandas as pd
+
+# Expected columns of the uploaded file (same fields as the Registrar form)
+REQUIRED_COLUMNS = ['data', 'squad', 'categoria', 'tipo_impacto', 'duracao']
+OPTIONAL_COLUMNS = ['hora_inicio', 'produto', 'descricao']
+
+# Same bounds as the Registrar form
+MAX_DURACAO = 24.0
+
+
+def read_upload(file, filename):
+    """Reads an uploaded CSV or Excel file as a DataFrame of strings."""
+    if filename.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(file, dtype=str)
+    else:
+        df = pd.read_csv(file, dtype=str, sep=None, engine='python', encoding='utf-8-sig')
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    return df.fillna('')
+
+
+def _parse_dates(values):
+    # ISO first (CSV exports and Excel cells), then the Brazilian dd/mm/yyyy format
+    parsed = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    missing = parsed.isna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(values[missing], format='%d/%m/%Y', errors='coerce')
+    return parsed
+
+
+def _parse_horas(values):
+    """Normalises 'H:MM', 'HH:MM' and 'HH:MM:SS' to 'HH:MM'; returns (horas, invalid mask)."""
+    parts = values.str.extract(r'^\s*(\d{1,2}):(\d{2})(?::\d{2})?\s*$')
+    hour = pd.to_numeric(parts[0], errors='coerce')
+    minute = pd.to_numeric(parts[1], errors='coerce')
+    valid = hour.between(0, 23) & minute.between(0, 59)
+    horas = hour.astype('Int64').astype(str).str.zfill(2) + ':' + parts[1]
+    empty = values.str.strip() == ''
+    return horas.where(valid, None), ~valid & ~empty
+
+
+def validate_incidents(df, tipos_impacto, squads, categorias, produtos, today=None):
+    """Validates uploaded rows against the reference tables, column by column.
+
+    Returns (valid rows ready for bulk_insert_incidents, errors) where errors is a
+    list of (linha, mensagem) using the line numbers of the uploaded file.
+    """
+    today = today or date.today()
+    missing_cols = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_cols:
+        return pd.DataFrame(), [(1, f"Colunas obrigatórias ausentes: {', '.join(missing_cols)}")]
+
+    df = df.copy()
+    for col in OPTIONAL_COLUMNS:
+        if col not in df.columns:
+            df[col] = ''
+    text = {col: df[col].astype(str).str.strip() for col in REQUIRED_COLUMNS + OPTIONAL_COLUMNS}
+
+    datas = _parse_dates(text['data'])
+    duracao = pd.to_numeric(text['duracao'].str.replace(',', '.'), errors='coerce')
+    horas, hora_invalida = _parse_horas(text['hora_inicio'])
+
+    checks = [
+        (datas.isna(), "Data inválida"),
+        (datas.dt.date > today, "A data não pode ser futura"),
+        (duracao.isna(), "Duração inválida"),
+        (duracao <= 0, "A duração deve ser maior que zero"),
+        (duracao > MAX_DURACAO, f"A duração não pode passar de {MAX_DURACAO:g}h"),
+        (hora_invalida, "Hora de início inválida (use HH:MM)"),
+        (~text['squad'].isin(squads), "Squad não cadastrado"),
+        (~text['categoria'].isin(categorias), "Categoria não cadastrada"),
+        (~text['tipo_impacto'].isin(list(tipos_impacto)), "Tipo de impacto não cadastrado"),
+        ((text['produto'] != '') & ~text['produto'].isin(produtos), "Produto não cadastrado"),
+    ]
+
+    invalid = pd.Series(False, index=df.index)
+    errors = []
+    for mask, message in checks:
+        mask = mask.fillna(False).astype(bool)
+        invalid |= mask
+        # +2: header line plus 1-based numbering
+        errors.extend((int(pos) + 2, message) for pos in df.index[mask])
+    errors.sort()
+
+    valid = ~invalid
+    peso = text['tipo_impacto'][valid].map(tipos_impacto).astype(float)
+    records = pd.DataFrame({
+        'data': datas[valid].dt.date,
+        'hora_inicio': horas[valid],
+        'squad': text['squad'][valid],
+        'categoria': text['categoria'][valid],
+        'tipo_impacto': text['tipo_impacto'][valid],
+        'peso': peso,
+        'duracao': duracao[valid].astype(float),
+        'hpp': duracao[valid].astype(float) * peso,
+        'descricao': text['descricao'][valid],
+        'produto': text['produto'][valid].replace('', None),
+    })
+    records['linha'] = records.index + 2
+    return records, errors
@@ -0,0 +1,59 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Metrics module - Environment score and report metrics shared by the app, reports and CLI
+"""
+
+from datetime import date, timedelta
+
+
+def calculate_environment_score(total_hpp, capacidade):
+    """Environment Score = 10 × (1 - Total_HPP / Capacidade_Total), clamped to 0..10."""
+    return max(0, min(10, 10 * (1 - (total_hpp / capacidade))))
+
+
+def score_status(score):
+    """Returns the status label of an environment score."""
+    return 'Bom' if score >= 7 else 'Atenção' if score >= 4 else 'Crítico'
+
+
+# HPP and incident counts of the last 7 days (up to the latest incident) and of the 7 days before
+TREND_WINDOWS = ['hpp_7d', 'incidentes_7d', 'hpp_7d_anterior', 'incidentes_7d_anterior']
+
+
+def build_trends(janelas):
+    """Returns the 7-day windows and their deltas (0 when the previous window is empty)."""
+    trends = {key: janelas[key] for key in TREND_WINDOWS}
+    has_previous = trends['incidentes_7d_anterior'] > 0
+    trends['hpp_trend'] = trends['hpp_7d'] - trends['hpp_7d_anterior'] if has_previous else 0.0
+    trends['inc_trend'] = trends['incidentes_7d'] - trends['incidentes_7d_anterior'] if has_previous else 0
+    return trends
+
+
+def build_metrics(total_incidentes, total_hpp, capacidade, janelas=None):
+    """Returns the metrics dict used by the dashboard cards, the CLI and generate_pdf_report.
+    
+    `janelas` (a mapping with the TREND_WINDOWS keys) adds the 7-day trends.
+    """
+    metrics = {
+        'total_incidentes': int(total_incidentes),
+        'total_hpp': float(total_hpp),
+        'media_hpp': float(total_hpp) / total_incidentes if total_incidentes else 0.0,
+        'environment_score': calculate_environment_score(total_hpp, capacidade),
+    }
+    if janelas is not None:
+        metrics.update(build_trends(janelas))
+    return metrics
+
+
+def previous_month(today=None):
+    """Returns (first day, last day) of the month before `today`."""
+    today = today or date.today()
+    fim = today.replace(day=1) - timedelta(days=1)
+    return fim.replace(day=1), fim
+
+
+def month_range(ano, mes):
+    """Returns (first day, last day) of the given month."""
+    inicio = date(ano, mes, 1)
+    proximo = (inicio + timedelta(days=32)).replace(day=1)
+    return inicio, proximo - timedelta(days=1)
@@ -0,0 +1,226 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Migrations module - Versioned schema migrations (SQLite and PostgreSQL)
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --explain  # print the query plans of the app's main queries
+"""
+
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, event, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+migrations_metadata = MetaData()
+
+schema_version = Table(
+    'schema_version', migrations_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('descricao', String, nullable=False),
+    Column('applied_at', DateTime, default=datetime.now)
+)
+
+# Key/value store for schema bookkeeping (e.g. the schema fingerprint checked at startup)
+schema_meta = Table(
+    'schema_meta', migrations_metadata,
+    Column('chave', String, primary_key=True),
+    Column('valor', String, nullable=False)
+)
+
+
+# ==================== MIGRATION STEPS ====================
+# Rows read and updated per round trip by the backfilling steps
+BACKFILL_BATCH_SIZE = 5000
+
+
+def _add_produto_column(conn):
+    columns = [c['name'] for c in inspect(conn).get_columns('incidents')]
+    if 'produto' not in columns:
+        conn.execute(text("ALTER TABLE incidents ADD COLUMN produto VARCHAR"))
+
+
+def _create_incident_filter_indexes(conn):
+    # Default ordering of every incidents read, plus the Histórico filter columns
+    for stmt in (
+        "CREATE INDEX IF NOT EXISTS ix_incidents_data_created ON incidents (data DESC, created_at DESC)",
+        "CREATE INDEX IF NOT EXISTS ix_incidents_squad_data ON incidents (squad, data)",
+        "CREATE INDEX IF NOT EXISTS ix_incidents_categoria_data ON incidents (categoria, data)",
+        "CREATE INDEX IF NOT EXISTS ix_incidents_produto_data ON incidents (produto, data)",
+        "CREATE INDEX IF NOT EXISTS ix_incidents_tipo_impacto_data ON incidents (tipo_impacto, data)",
+    ):
+        conn.execute(text(stmt))
+
+
+def _create_history_sort_indexes(conn):
+    # Keyset pagination orders by (sort column, id)
+    for column in ('data', 'hpp', 'duracao', 'squad', 'categoria'):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_incidents_sort_{column} ON incidents ({column}, id)"))
+
+
+def _add_dimension_foreign_keys(conn):
+    # Integer references replacing the repeated name strings, backfilled by name
+    columns = [c['name'] for c in inspect(conn).get_columns('incidents')]
+    for name_col, table in (('squad', 'squads'), ('categoria', 'categorias'),
+                            ('tipo_impacto', 'tipos_impacto'), ('produto', 'produtos')):
+        id_col = f"{name_col}_id"
+        if id_col not in columns:
+            conn.execute(text(f"ALTER TABLE incidents ADD COLUMN {id_col} INTEGER REFERENCES {table}(id) ON DELETE SET NULL"))
+        conn.execute(text(
+            f"UPDATE incidents SET {id_col} = (SELECT {table}.id FROM {table} WHERE {table}.nome = incidents.{name_col}) "
+            f"WHERE {id_col} IS NULL"
+        ))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_incidents_{id_col}_data ON incidents ({id_col}, data)"))
+
+
+def _add_start_timestamp(conn):
+    # Typed start timestamp plus weekday/hour for the dashboard heatmap, backfilled in Python
+    # so both dialects derive them exactly like database.derive_start_columns does on write
+    from database import derive_start_columns
+    
+    columns = [c['name'] for c in inspect(conn).get_columns('incidents')]
+    for column, sql_type in (('inicio', 'TIMESTAMP'), ('dia_semana', 'SMALLINT'), ('hora', 'SMALLINT')):
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE incidents ADD COLUMN {column} {sql_type}"))
+    
+    # Keyset batches by id: memory stays bounded by the batch size on large tables, and
+    # rows whose weekday stays NULL (no date) are not selected again
+    select_batch = text(
+        "SELECT id, data, hora_inicio FROM incidents WHERE dia_semana IS NULL AND id > :ultimo ORDER BY id LIMIT :limite"
+    )
+    update = text("UPDATE incidents SET inicio = :inicio, dia_semana = :dia_semana, hora = :hora WHERE id = :id")
+    ultimo = 0
+    while True:
+        rows = conn.execute(select_batch, {'ultimo': ultimo, 'limite': BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            break
+        conn.execute(update, [dict(id=row.id, **derive_start_columns(row.data, row.hora_inicio)) for row in rows])
+        ultimo = rows[-1].id
+    # Covering index for the weekday x hour GROUP BY, plus range scans on the timestamp
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_incidents_dia_semana_hora ON incidents (dia_semana, hora, hpp)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_incidents_inicio ON incidents (inicio)"))
+
+
+def _rebuild_rollup_hours(conn):
+    # Rollup rows were bucketed by a looser hour parser than the incident columns
+    # (e.g. '25:99' became hour 25); recompute them with the shared parser
+    from database import _accumulate_rollup, _apply_rollup_deltas, _bump_data_version, _select_rollup_sources, incident_rollup
+    
+    rows = _select_rollup_sources(conn)
+    conn.execute(incident_rollup.delete())
+    _apply_rollup_deltas(conn, _accumulate_rollup(rows))
+    _bump_data_version(conn)
+
+
+# Ordered list of (version, description, step). Never reorder or edit applied steps;
+# append a new version instead.
+MIGRATIONS = [
+    (1, "Add produto column to incidents", _add_produto_column),
+    (2, "Composite indexes for incident filters and default ordering", _create_incident_filter_indexes),
+    (3, "Keyset indexes for Histórico sorting", _create_history_sort_indexes),
+    (4, "Integer foreign keys from incidents to the dimension tables", _add_dimension_foreign_keys),
+    (5, "Typed start timestamp with weekday and hour", _add_start_timestamp),
+    (6, "Rebuild rollup hour buckets with the shared start time parser", _rebuild_rollup_hours),
+]
+
+
+# ==================== RUNNER ====================
+def get_schema_version(conn):
+    """Returns the latest applied migration version (0 for a fresh database)."""
+    return conn.execute(select(schema_version.c.version).order_by(schema_version.c.version.desc()).limit(1)).scalar() or 0
+
+
+def apply_migrations(engine):
+    """Applies pending migrations in order, each one in its own transaction."""
+    schema_version.create(engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+
+    applied = []
+    for version, descricao, step in MIGRATIONS:
+        if version <= current:
+            continue
+        print(f"Migrating: v{version} - {descricao}...")
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(schema_version.insert().values(version=version, descricao=descricao))
+        applied.append(version)
+    return applied
+
+
+def read_schema_meta(engine, chave):
+    """Returns a stored schema_meta value, or None when missing (or the table does not exist yet)."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(schema_meta.c.valor).where(schema_meta.c.chave == chave)).scalar()
+    except SQLAlchemyError:
+        return None
+
+
+def write_schema_meta(engine, chave, valor):
+    """Stores a schema_meta value."""
+    schema_meta.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(schema_meta.delete().where(schema_meta.c.chave == chave))
+        conn.execute(schema_meta.insert().values(chave=chave, valor=valor))
+
+
+# ==================== QUERY PLANS ====================
+@contextmanager
+def capture_query_plans(engine):
+    """Records the EXPLAIN output of every statement executed inside the block."""
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == 'sqlite' else "EXPLAIN "
+    plans = []
+
+    def _explain(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            cursor.execute(prefix + statement, parameters)
+            plans.append((statement, [str(row[-1]) for row in cursor.fetchall()]))
+
+    event.listen(engine, 'before_cursor_execute', _explain)
+    try:
+        yield plans
+    finally:
+        event.remove(engine, 'before_cursor_execute', _explain)
+
+
+def explain_main_queries():
+    """Prints the query plans of the dashboard and Histórico queries."""
+    import database
+
+    squads = database.get_squads()
+    data_min, data_max = database.get_incident_date_range()
+    queries = [
+        ("Dashboard rollup", lambda: database.get_dashboard_rollup()),
+        ("Heatmap dia x hora", lambda: database.get_heatmap_matrix()),
+        ("Todos os incidentes", lambda: database.get_all_incidents()),
+        ("Histórico - página padrão", lambda: database.get_incidents_page()),
+        ("Histórico - squad, ordenado por HPP", lambda: database.get_incidents_page({'squads': squads[:1]}, sort_column='hpp')),
+        ("Histórico - período", lambda: database.get_incidents_page({'data_inicio': data_min, 'data_fim': data_max})),
+        ("Exportação filtrada", lambda: database.get_filtered_incidents({'squads': squads[:1]})),
+    ]
+
+    for label, run in queries:
+        with capture_query_plans(database.engine) as plans:
+            run()
+        print(f"\n=== {label} ===")
+        for statement, plan in plans:
+            print(" ".join(statement.split()))
+            for line in plan:
+                print(f"    {line}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="B.I.T. schema migrations")
+    parser.add_argument("--explain", action="store_true", help="print the query plans of the main queries")
+    args = parser.parse_args()
+
+    import database
+    database.metadata.create_all(database.engine)
+    applied = apply_migrations(database.engine)
+    print(f"Schema version: {MIGRATIONS[-1][0]} ({len(applied)} applied now)")
+
+    if args.explain:
+        explain_main_queries()
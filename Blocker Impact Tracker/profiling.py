@@ -0,0 +1,158 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Profiling module - Timing spans for reruns, database calls and exports
+
+Enabled with BIT_PROFILING=1. Spans are kept per rerun (for the sidebar debug panel)
+and appended as JSON lines to BIT_PROFILING_LOG, shared by every session.
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+PROFILING_ENABLED = os.getenv("BIT_PROFILING", "").lower() in ("1", "true", "yes")
+PROFILING_LOG = os.getenv("BIT_PROFILING_LOG", "profiling.jsonl")
+# Most recent log lines read for the p50/p95 summary
+PROFILING_SUMMARY_LINES = 20_000
+
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+def _record(name, elapsed_ms):
+    stack = getattr(_local, 'stack', [])
+    entry = {
+        'name': name,
+        'parent': stack[-1] if stack else None,
+        'ms': round(elapsed_ms, 3),
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'pid': os.getpid(),
+    }
+    spans = getattr(_local, 'spans', None)
+    if spans is not None:
+        spans.append(entry)
+    line = json.dumps(entry, ensure_ascii=False)
+    with _log_lock:
+        with open(PROFILING_LOG, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+
+@contextmanager
+def span(name):
+    """Times the enclosed block as `name` (no-op when profiling is disabled)."""
+    if not PROFILING_ENABLED:
+        yield
+        return
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stack.pop()
+        _record(name, (time.perf_counter() - start) * 1000)
+
+
+def profiled(fn, name=None):
+    """Wraps `fn` in a span; generator functions are timed until exhausted."""
+    name = name or f"{fn.__module__}.{fn.__name__}"
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def gen_wrapper(*args, **kwargs):
+            with span(name):
+                yield from fn(*args, **kwargs)
+        return gen_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def instrument_module(namespace, exclude=()):
+    """Replaces the public functions defined in a module namespace by profiled wrappers.
+
+    Call it at the end of the module (`instrument_module(globals())`) so calls made
+    inside the module go through the wrappers too. No-op when profiling is disabled.
+    """
+    if not PROFILING_ENABLED:
+        return
+    module = namespace['__name__']
+    for name, value in list(namespace.items()):
+        if (inspect.isfunction(value) and value.__module__ == module
+                and not name.startswith('_') and name not in exclude):
+            namespace[name] = profiled(value)
+
+
+# ==================== RERUNS ====================
+def start_rerun():
+    """Starts collecting the spans of the current script run (thread)."""
+    _local.spans = []
+    _local.rerun_start = time.perf_counter()
+
+
+def finish_rerun(name='rerun'):
+    """Records the whole-rerun span and returns the spans collected since start_rerun()."""
+    spans = getattr(_local, 'spans', None)
+    if not PROFILING_ENABLED or spans is None:
+        return []
+    _record(name, (time.perf_counter() - _local.rerun_start) * 1000)
+    _local.spans = None
+    return spans
+
+
+@contextmanager
+def fragment_rerun(name):
+    """Times a fragment body as `name`.
+    
+    Inside a full rerun it is an ordinary span; when only the fragment reruns, the
+    run is recorded as its own rerun, `rerun:<name>`.
+    """
+    if not PROFILING_ENABLED or getattr(_local, 'spans', None) is not None:
+        with span(name):
+            yield
+        return
+    start_rerun()
+    try:
+        with span(name):
+            yield
+    finally:
+        finish_rerun(f"rerun:{name}")
+
+
+def summarize_log(path=None, max_lines=PROFILING_SUMMARY_LINES):
+    """Returns [{'name', 'count', 'p50_ms', 'p95_ms', 'max_ms'}] over the most recent log lines."""
+    try:
+        with open(path or PROFILING_LOG, encoding='utf-8') as f:
+            lines = deque(f, maxlen=max_lines)
+    except FileNotFoundError:
+        return []
+
+    durations = {}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        durations.setdefault(entry['name'], []).append(entry['ms'])
+
+    summary = []
+    for name, values in durations.items():
+        values = np.asarray(values)
+        summary.append({
+            'name': name,
+            'count': len(values),
+            'p50_ms': round(float(np.percentile(values, 50)), 2),
+            'p95_ms': round(float(np.percentile(values, 95)), 2),
+            'max_ms': round(float(values.max()), 2),
+        })
+    return sorted(summary, key=lambda row: row['p95_ms'], reverse=True)
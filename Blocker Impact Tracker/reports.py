@@ -0,0 +1,238 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Reports module - Background report jobs and disk-backed report store
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import database
+from config import DEFAULT_CAPACITY
+from exports import export_cache_key, generate_pdf_report, write_blocks
+from metrics import build_metrics, previous_month
+from profiling import span
+
+# Generated reports live on disk, so every session (and restarts) reuse them
+REPORTS_DIR = os.getenv("REPORTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports"))
+REPORT_STORE_MAX_FILES = int(os.getenv("REPORT_STORE_MAX_FILES", "100"))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+# Seconds between checks for the monthly report (0 disables the scheduler)
+REPORT_SCHEDULE_INTERVAL = float(os.getenv("REPORT_SCHEDULE_INTERVAL", "3600"))
+# Seconds before the first check, so a cold start renders the first page before
+# the scheduler loads reportlab and queries the database
+REPORT_SCHEDULE_DELAY = float(os.getenv("REPORT_SCHEDULE_DELAY", "60"))
+
+# Job status values (shown in the UI)
+PENDENTE = 'pendente'
+EXECUTANDO = 'executando'
+CONCLUIDO = 'concluido'
+ERRO = 'erro'
+
+MAX_TRACKED_JOBS = 50
+
+
+# ==================== REPORT STORE ====================
+def report_key(filtros, data_version, formato):
+    """Content hash of a report: its format, filter set and the data version it was built from."""
+    payload = json.dumps(export_cache_key(filtros, data_version, formato), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _report_path(key, formato):
+    return os.path.join(REPORTS_DIR, f"{key}.{formato}")
+
+
+def report_path(key, formato):
+    """Returns the path of a stored report, or None when it was not generated yet."""
+    path = _report_path(key, formato)
+    return path if os.path.exists(path) else None
+
+
+def load_report(key, formato):
+    """Returns the stored report bytes, or None when it was not generated yet (or was pruned).
+    
+    Reading a report touches its mtime, so _prune_reports evicts the least recently used.
+    """
+    path = _report_path(key, formato)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+
+def save_report(key, formato, data):
+    """Writes a report atomically and prunes the least recently used files beyond REPORT_STORE_MAX_FILES.
+    
+    `data` is the report bytes or an iterable of bytes blocks (e.g. exports.iter_csv),
+    which is streamed to the file without holding the whole report. Returns the path.
+    """
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = _report_path(key, formato)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        write_blocks([data] if isinstance(data, bytes) else data, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _prune_reports()
+    return path
+
+
+def _prune_reports():
+    entries = [
+        entry for entry in os.scandir(REPORTS_DIR)
+        if entry.is_file() and not entry.name.endswith('.tmp')
+    ]
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[REPORT_STORE_MAX_FILES:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+# ==================== JOB RUNNER ====================
+# A thread pool is enough here: jobs spend their time in the database and in
+# reportlab/openpyxl, and the goal is to keep the Streamlit script from blocking.
+_executor = None
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix='bit-report')
+        return _executor
+
+
+def submit_report(key, formato, builder, descricao=''):
+    """Queues `builder()` to generate a report, unless it is stored or already queued.
+
+    Returns a copy of the job status dict.
+    """
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job and job['status'] in (PENDENTE, EXECUTANDO):
+            return dict(job)
+
+        job = {
+            'key': key, 'formato': formato, 'descricao': descricao,
+            'status': PENDENTE, 'erro': None, 'caminho': None, 'criado_em': datetime.now(), 'concluido_em': None
+        }
+        if report_path(key, formato):
+            job.update(status=CONCLUIDO, caminho=report_path(key, formato), concluido_em=job['criado_em'])
+        _jobs[key] = job
+        _forget_old_jobs()
+        if job['status'] == CONCLUIDO:
+            return dict(job)
+
+    _get_executor().submit(_run_job, key, formato, builder)
+    return dict(job)
+
+
+def _run_job(key, formato, builder):
+    _update_job(key, status=EXECUTANDO)
+    try:
+        # Streamed builders (iterables of blocks) run while the file is written
+        with span(f"report.{formato}"):
+            path = save_report(key, formato, builder())
+        _update_job(key, status=CONCLUIDO, caminho=path, concluido_em=datetime.now())
+    except Exception as e:
+        print(f"Error generating report {key[:12]}: {e}")
+        _update_job(key, status=ERRO, erro=str(e), concluido_em=datetime.now())
+
+
+def _update_job(key, **values):
+    with _jobs_lock:
+        if key in _jobs:
+            _jobs[key].update(values)
+
+
+def _forget_old_jobs():
+    finished = [job for job in _jobs.values() if job['status'] in (CONCLUIDO, ERRO)]
+    finished.sort(key=lambda job: job['criado_em'])
+    for job in finished[:max(0, len(_jobs) - MAX_TRACKED_JOBS)]:
+        del _jobs[job['key']]
+
+
+def get_job(key):
+    """Returns a copy of the job status dict for `key`, or None.
+    
+    A finished job whose file was pruned from the store is dropped (None), so the
+    report can be submitted again.
+    """
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job and job['status'] == CONCLUIDO and not os.path.exists(_report_path(key, job['formato'])):
+            del _jobs[key]
+            job = None
+        return dict(job) if job else None
+
+
+def list_jobs():
+    """Returns copies of the tracked jobs, newest first."""
+    with _jobs_lock:
+        jobs = [dict(job) for job in _jobs.values()]
+    return sorted(jobs, key=lambda job: job['criado_em'], reverse=True)
+
+
+# ==================== MONTHLY REPORT ====================
+def build_monthly_report(inicio, fim, capacidade=DEFAULT_CAPACITY):
+    """Generates the PDF report for the incidents between `inicio` and `fim`."""
+    df = database.get_filtered_incidents({'data_inicio': inicio, 'data_fim': fim})
+    metrics = build_metrics(len(df), df['hpp'].sum() if not df.empty else 0.0, capacidade)
+    return generate_pdf_report(df, metrics, f"Mensal - {inicio.strftime('%m/%Y')}")
+
+
+def monthly_report_key(today=None, capacidade=DEFAULT_CAPACITY):
+    inicio, fim = previous_month(today)
+    filtros = {'data_inicio': inicio, 'data_fim': fim, 'capacidade': capacidade}
+    return report_key(filtros, database.get_data_version(), 'pdf')
+
+
+def submit_monthly_report(today=None, capacidade=DEFAULT_CAPACITY):
+    """Queues the previous month's PDF report (no-op when it is already stored)."""
+    inicio, fim = previous_month(today)
+    return submit_report(
+        monthly_report_key(today, capacidade), 'pdf',
+        lambda: build_monthly_report(inicio, fim, capacidade),
+        f"Relatório mensal {inicio.strftime('%m/%Y')}"
+    )
+
+
+_scheduler_started = False
+
+
+def start_scheduler():
+    """Starts (once per process) the daemon thread that keeps the monthly report generated."""
+    global _scheduler_started
+    with _jobs_lock:
+        if _scheduler_started or REPORT_SCHEDULE_INTERVAL <= 0:
+            return
+        _scheduler_started = True
+
+    def loop():
+        time.sleep(REPORT_SCHEDULE_DELAY)
+        while True:
+            try:
+                submit_monthly_report()
+            except Exception as e:
+                print(f"Error scheduling monthly report: {e}")
+            time.sleep(REPORT_SCHEDULE_INTERVAL)
+
+    threading.Thread(target=loop, name='bit-report-scheduler', daemon=True).start()
@@ -0,0 +1,9 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Test configuration - makes the app modules importable from the tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,83 @@
+"""
+B.I.T. - Blocker Impact Tracker
+Chart tests - timeline bucketing, downsampling and trace selection
+"""
+
+import numpy as np
+import pandas as pd
+
+from charts import TIMELINE_MAX_POINTS, TIMELINE_WEBGL_THRESHOLD, create_timeline, timeline_series
+
+
+def _serie(dias, por_dia=1):
+    """One incident per day (or `por_dia` of them) over `dias` consecutive days."""
+    datas = pd.Series(pd.date_range('2020-01-01', periods=dias, freq='D').repeat(por_dia))
+    valores = pd.Series(np.random.default_rng(7).uniform(0.1, 5.0, len(datas)))
+    return datas, valores
+
+
+def _trace(df_timeline, bucket):
+    return create_timeline(df_timeline, bucket).data[0].type
+
+
+def test_short_range_is_plotted_per_day_with_svg():
+    datas, valores = _serie(120, por_dia=3)
+    df_timeline, bucket = timeline_series(datas, valores)
+    
+    assert bucket == 'D'
+    assert len(df_timeline) == 120
+    assert np.isclose(df_timeline['hpp'].sum(), valores.sum())
+    assert len(df_timeline) <= TIMELINE_WEBGL_THRESHOLD
+    assert _trace(df_timeline, bucket) == 'scatter'
+
+
+def test_range_near_the_target_switches_to_webgl():
+    datas, valores = _serie(TIMELINE_MAX_POINTS)
+    df_timeline, bucket = timeline_series(datas, valores)
+    
+    assert bucket == 'D'
+    assert len(df_timeline) > TIMELINE_WEBGL_THRESHOLD
+    assert _trace(df_timeline, bucket) == 'scattergl'
+
+
+def test_medium_range_is_bucketed_per_week():
+    datas, valores = _serie(3 * 365)
+    df_timeline, bucket = timeline_series(datas, valores)
+    
+    assert bucket == 'W'
+    assert len(df_timeline) <= TIMELINE_MAX_POINTS
+    assert (df_timeline['data'].dt.dayofweek == 0).all()
+    assert np.isclose(df_timeline['hpp'].sum(), valores.sum())
+
+
+def test_long_range_is_bucketed_per_month():
+    datas, valores = _serie(12 * 365)
+    df_timeline, bucket = timeline_series(datas, valores)
+    
+    assert bucket == 'M'
+    assert len(df_timeline) == datas.dt.to_period('M').nunique()
+    assert (df_timeline['data'].dt.day == 1).all()
+    assert np.isclose(df_timeline['hpp'].sum(), valores.sum())
+    assert 'Mês: %{x|%m/%Y}' in create_timeline(df_timeline, bucket).data[0].hovertemplate
+
+
+def test_range_beyond_monthly_buckets_samples_the_daily_series_with_lttb():
+    datas, valores = _serie(3 * 365)
+    valores[500] = 500.0
+    df_timeline, bucket = timeline_series(datas, valores, max_points=30)
+    
+    assert bucket == 'S'
+    assert len(df_timeline) == 30
+    assert df_timeline['data'].iloc[0] == datas.min()
+    assert df_timeline['data'].iloc[-1] == datas.max()
+    assert df_timeline['data'].is_monotonic_increasing
+    # LTTB keeps real daily points, so the peak survives the downsampling
+    assert df_timeline['hpp'].max() == 500.0
+    assert create_timeline(df_timeline, bucket).data[0].hovertemplate.startswith('Dia (amostra):')
+
+
+def test_empty_series():
+    df_timeline, bucket = timeline_series(pd.Series([], dtype='datetime64[ns]'), pd.Series([], dtype='float64'))
+    
+    assert bucket == 'D'
+    assert df_timeline.empty